@@ -9,6 +9,7 @@
 
 import os
 import sys
+import asyncio
 import logging
 import socket
 from typing import Optional
@@ -26,12 +27,15 @@ from core.services.pptx_mcp_service import get_service
 # 服务器实例（FastMCP 2.x 推荐用法）
 mcp = FastMCP("AI-Office-PPTX-MCP")
 
+# 限制并发转换/上传数量，与 MinIO 连接池大小保持匹配
+_convert_semaphore = asyncio.Semaphore(int(os.getenv("MCP_MAX_CONCURRENCY", "8")))
+
 
 @mcp.tool(
     name="md_to_minio_url",
     description="将 Markdown 字符串转换为 PPTX 并上传到 MinIO，返回可访问的 URL。",
 )
-def md_to_minio_url(
+async def md_to_minio_url(
     md_content: str,
     filename: Optional[str] = None,
     template_path: Optional[str] = None,
@@ -50,7 +54,9 @@ def md_to_minio_url(
     logger = logging.getLogger("mcp")
     logger.info("[tool] md_to_minio_url called: filename=%s, md_length=%s", filename, len(md_content) if md_content else 0)
     service = get_service(template_path=template_path, enable_logging=enable_logging)
-    url = service.convert_md_to_pptx_url(md_content, filename)
+    # 构建在进程池、上传在线程中执行，避免阻塞事件循环
+    async with _convert_semaphore:
+        url = await service.convert_md_to_pptx_url_async(md_content, filename)
     logger.info("[tool] md_to_minio_url completed: url=%s", url)
     return url
 
@@ -77,8 +83,10 @@ def main() -> None:
     logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
     logger = logging.getLogger("mcp")
 
-    # 运行参数（通过环境变量可配置）- 按 Dify/SSE 文章示例优化
-    transport = os.getenv("FASTMCP_TRANSPORT", "sse").lower()
+    # 运行参数（通过环境变量可配置）- 默认使用 Streamable HTTP，可通过 FASTMCP_TRANSPORT=sse 回退
+    transport = os.getenv("FASTMCP_TRANSPORT", "http").lower()
+    if transport == "streamable-http":
+        transport = "http"
     host = os.getenv("FASTMCP_HOST", "0.0.0.0")
     try:
         port = int(os.getenv("FASTMCP_PORT", "8099"))
@@ -94,34 +102,19 @@ def main() -> None:
     http_base = f"http://{host}:{port}"
     print("启动 AI-Office-PPTX-MCP 服务…")
     print(f"服务器地址: {http_base}")
-    print(f"SSE 端点: http://localhost:{port}/sse")
-    print(f"Docker 中的 Dify 连接: http://host.docker.internal:{port}/sse")
+    endpoint_path = "/mcp" if transport == "http" else "/sse"
+    print(f"{'Streamable HTTP' if transport == 'http' else 'SSE'} 端点: http://localhost:{port}{endpoint_path}")
+    print(f"Docker 中的 Dify 连接: http://host.docker.internal:{port}{endpoint_path}")
     print("可用工具:")
     print("- md_to_minio_url: 将 Markdown 转为 PPTX 并上传 MinIO，返回 URL")
 
-    # FastMCP 在不同传输下的运行方式
-    try:
-        if transport == "http":
-            if hasattr(mcp, "run_http"):
-                try:
-                    mcp.run_http(host=host, port=port, stream=True)
-                except TypeError:
-                    logger.warning("[startup] run_http(stream=True) 不被支持，回退 run_http(host, port)")
-                    mcp.run_http(host=host, port=port)
-            else:
-                logger.warning("[startup] 未找到 run_http，回退 run(host, port)")
-                mcp.run(host=host, port=port)
-        elif transport in ("sse", "ws", "websocket"):
-            # 兼容 fastmcp.run 直接以 host/port 暴露 SSE/WS
-            try:
-                mcp.run(transport=transport, host=host, port=port)
-            except TypeError:
-                mcp.run(host=host, port=port)
-        else:
-            mcp.run()
-    except TypeError:
-        logger.warning("[startup] run() 不支持 host/port 形参，降级为无参运行")
-        mcp.run()
+    # FastMCP 在不同传输下的运行方式；不支持的传输或参数由 FastMCP 直接报错，不再静默降级为 stdio
+    if transport == "http":
+        mcp.run(transport="streamable-http", host=host, port=port)
+    elif transport == "stdio":
+        mcp.run(transport="stdio")
+    else:
+        mcp.run(transport=transport, host=host, port=port)
 
 
 if __name__ == "__main__":
@@ -7,16 +7,34 @@ MinIO文件服务 - 基于MinIO的文件上传和管理服务
 替换原有的RustFSService，提供文件上传、下载和管理功能
 """
 
+import logging
 import os
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, Iterable, List, Optional
 from datetime import timedelta
+
+import certifi
+import urllib3
 from minio import Minio
 from minio.error import S3Error
 
+logger = logging.getLogger("minio_service")
+
 
 class MinIOService:
     """MinIO文件服务类，提供文件上传、下载和管理功能"""
     
+    # 预签名URL缓存上限，以及距离过期多少秒内视为失效
+    URL_CACHE_MAX_ENTRIES = 1024
+    URL_CACHE_REFRESH_MARGIN = 60
+    
+    # 已确认存在的存储桶: (endpoint, bucket_name)，进程内所有实例共享
+    _bucket_checked = set()
+    
     def __init__(self, 
                  endpoint: Optional[str] = None,
                  access_key: Optional[str] = None, 
@@ -39,27 +57,61 @@ class MinIOService:
         self.bucket_name = bucket_name or os.getenv("MINIO_BUCKET", "ai-office-test")
         self.secure = secure
         
+        # 预签名URL缓存: (object_name, expires_in_seconds) -> (过期时刻, url)
+        self._url_cache = OrderedDict()
+        self._url_cache_lock = threading.Lock()
+        
+        # 复用连接池：keep-alive + 合理的池大小，避免每次请求重新握手
+        # 传入自定义 http_client 时 minio 不再配置证书校验，这里按 minio 默认客户端的方式校验
+        self.pool_maxsize = int(os.getenv("MINIO_POOL_MAXSIZE", "32"))
+        self._http = urllib3.PoolManager(
+            num_pools=10,
+            maxsize=self.pool_maxsize,
+            block=False,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            timeout=urllib3.Timeout(connect=5, read=30),
+            retries=urllib3.Retry(
+                total=5,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+        
         # 初始化MinIO客户端
         self.client = Minio(
             self.endpoint,
             access_key=self.access_key,
             secret_key=self.secret_key,
-            secure=self.secure
+            secure=self.secure,
+            http_client=self._http
         )
         
-        # 确保存储桶存在
-        self._ensure_bucket_exists()
+        # 确保存储桶存在（已检查过或设置 MINIO_SKIP_BUCKET_CHECK=1 时不发请求）
+        self.ensure_bucket_exists()
     
-    def _ensure_bucket_exists(self):
-        """确保存储桶存在，如果不存在则创建"""
+    def ensure_bucket_exists(self, force: bool = False):
+        """
+        确保存储桶存在，如果不存在则创建
+        
+        同一 (endpoint, bucket) 在进程内成功检查一次后不再重复请求；
+        环境变量 MINIO_SKIP_BUCKET_CHECK=1 时直接跳过检查。
+        
+        Args:
+            force: 忽略上述跳过条件，强制检查
+        """
+        key = (self.endpoint, self.bucket_name)
+        if not force and (key in self._bucket_checked or os.getenv("MINIO_SKIP_BUCKET_CHECK") == "1"):
+            return
         try:
             if not self.client.bucket_exists(self.bucket_name):
                 self.client.make_bucket(self.bucket_name)
-                print(f"✅ 创建存储桶: {self.bucket_name}")
+                logger.debug("创建存储桶: %s", self.bucket_name)
             else:
-                print(f"✅ 存储桶已存在: {self.bucket_name}")
+                logger.debug("存储桶已存在: %s", self.bucket_name)
+            self._bucket_checked.add(key)
         except S3Error as e:
-            print(f"❌ 存储桶操作失败: {e}")
+            logger.warning("存储桶操作失败: %s", e, exc_info=True)
             raise
     
     def upload_file(self, local_path: str, object_name: Optional[str] = None) -> str:
@@ -82,14 +134,45 @@ class MinIOService:
         try:
             # 上传文件
             self.client.fput_object(self.bucket_name, object_name, local_path)
-            print(f"✅ 文件上传成功: {object_name}")
+            logger.debug("文件上传成功: %s", object_name)
             
             # 生成预签名URL
-            url = self.client.get_presigned_url("GET", self.bucket_name, object_name)
-            return url
+            return self.get_file_url(object_name)
             
         except S3Error as e:
-            print(f"❌ 文件上传失败: {e}")
+            logger.warning("文件上传失败: %s", e, exc_info=True)
+            raise
+    
+    def upload_stream(self, stream: BinaryIO, length: int, object_name: str,
+                      content_type: str = "application/vnd.openxmlformats-officedocument.presentationml.presentation") -> str:
+        """
+        从内存/临时缓冲区直接上传数据到MinIO，无需先落盘
+        
+        Args:
+            stream: 可读的二进制流（需已定位到起始位置）
+            length: 数据长度（字节）
+            object_name: 对象名称
+            content_type: 内容类型，默认PPTX
+            
+        Returns:
+            str: 预签名URL
+        """
+        try:
+            self.client.put_object(
+                self.bucket_name,
+                object_name,
+                stream,
+                length,
+                content_type=content_type,
+                part_size=16 * 1024 * 1024
+            )
+            logger.debug("文件上传成功: %s", object_name)
+            
+            # 生成预签名URL
+            return self.get_file_url(object_name)
+            
+        except S3Error as e:
+            logger.warning("文件上传失败: %s", e, exc_info=True)
             raise
     
     def download_file(self, object_name: str, local_path: str) -> bool:
@@ -109,11 +192,11 @@ class MinIOService:
             
             # 下载文件
             self.client.fget_object(self.bucket_name, object_name, local_path)
-            print(f"✅ 文件下载成功: {object_name} -> {local_path}")
+            logger.debug("文件下载成功: %s -> %s", object_name, local_path)
             return True
             
         except S3Error as e:
-            print(f"❌ 文件下载失败: {e}")
+            logger.warning("文件下载失败: %s", e, exc_info=True)
             return False
     
     def delete_file(self, object_name: str) -> bool:
@@ -128,11 +211,11 @@ class MinIOService:
         """
         try:
             self.client.remove_object(self.bucket_name, object_name)
-            print(f"✅ 文件删除成功: {object_name}")
+            logger.debug("文件删除成功: %s", object_name)
             return True
             
         except S3Error as e:
-            print(f"❌ 文件删除失败: {e}")
+            logger.warning("文件删除失败: %s", e, exc_info=True)
             return False
     
     def list_files(self, prefix: str = "") -> list:
@@ -150,12 +233,12 @@ class MinIOService:
             return [obj.object_name for obj in objects]
             
         except S3Error as e:
-            print(f"❌ 文件列表获取失败: {e}")
+            logger.warning("文件列表获取失败: %s", e, exc_info=True)
             return []
     
     def get_file_url(self, object_name: str, expires_in_seconds: int = 604800) -> str:
         """
-        获取文件的预签名URL
+        获取文件的预签名URL（同一对象与有效期的URL会被缓存，临近过期时重新签名）
         
         Args:
             object_name: 对象名称
@@ -164,6 +247,14 @@ class MinIOService:
         Returns:
             str: 预签名URL
         """
+        key = (object_name, expires_in_seconds)
+        now = time.monotonic()
+        with self._url_cache_lock:
+            cached = self._url_cache.get(key)
+            if cached is not None and cached[0] - now > self.URL_CACHE_REFRESH_MARGIN:
+                self._url_cache.move_to_end(key)
+                return cached[1]
+        
         try:
             url = self.client.get_presigned_url(
                 "GET", 
@@ -171,12 +262,40 @@ class MinIOService:
                 object_name,
                 expires=timedelta(seconds=expires_in_seconds)
             )
+            with self._url_cache_lock:
+                self._url_cache[key] = (now + expires_in_seconds, url)
+                self._url_cache.move_to_end(key)
+                if len(self._url_cache) > self.URL_CACHE_MAX_ENTRIES:
+                    self._url_cache.popitem(last=False)
             return url
             
         except S3Error as e:
-            print(f"❌ URL生成失败: {e}")
+            logger.warning("URL生成失败: %s", e, exc_info=True)
             raise
     
+    def bulk_presign(self, names: Iterable[str], expires: int = 604800,
+                     concurrency: int = 16) -> List[str]:
+        """
+        批量获取预签名URL，使用线程池并行签名
+        
+        Minio客户端在线程间共享是安全的；并发数不应超过连接池大小
+        （MINIO_POOL_MAXSIZE），超出部分会被截断到连接池大小。
+        
+        Args:
+            names: 对象名称列表
+            expires: URL过期时间（秒），默认7天
+            concurrency: 并发线程数，默认16
+            
+        Returns:
+            List[str]: 与names顺序一致的预签名URL列表
+        """
+        names = list(names)
+        if not names:
+            return []
+        workers = max(1, min(concurrency, self.pool_maxsize, len(names)))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(lambda n: self.get_file_url(n, expires), names))
+    
     def file_exists(self, object_name: str) -> bool:
         """
         检查文件是否存在
@@ -226,5 +345,35 @@ class MinIOService:
         return f"{base_url}/{self.bucket_name}"
 
 
+@lru_cache(maxsize=4)
+def _get_cached_service(endpoint: str, access_key: str, secret_key: str,
+                        bucket_name: str, secure: bool) -> MinIOService:
+    return MinIOService(endpoint, access_key, secret_key, bucket_name, secure)
+
+
+def get_minio_service(endpoint: Optional[str] = None,
+                      access_key: Optional[str] = None,
+                      secret_key: Optional[str] = None,
+                      bucket_name: Optional[str] = None,
+                      secure: bool = False) -> MinIOService:
+    """
+    获取进程内共享的MinIOService实例
+    
+    相同的 (endpoint, access_key, bucket, secure) 复用同一个Minio客户端，
+    避免每次请求重复建立连接池和检查存储桶。Minio客户端是线程安全的，
+    可在FastMCP的多个工作任务之间共享。
+    
+    Returns:
+        MinIOService: 共享的服务实例
+    """
+    return _get_cached_service(
+        endpoint or os.getenv("MINIO_ENDPOINT", "172.27.0.1:19100"),
+        access_key or os.getenv("MINIO_ACCESS_KEY", "rustfsadmin"),
+        secret_key or os.getenv("MINIO_SECRET_KEY", "rustfsadmin"),
+        bucket_name or os.getenv("MINIO_BUCKET", "ai-office-test"),
+        secure
+    )
+
+
 # 为了兼容性，创建一个别名
 RustFSService = MinIOService
@@ -7,12 +7,36 @@ md2pptx_components - PPTX构建器组件包
 - LayoutManager: 布局管理器
 - SlideBuilder: 幻灯片构建器
 - PPTXBuilder: 主构建器类
+
+组件依赖 python-pptx / yaml，按需导入：首次访问某个名称时才加载其所在模块（PEP 562），
+只用到 logger 等子模块时不会加载 python-pptx
 """
 
-from .font_calculator import FontCalculator
-from .content_renderer import ContentRenderer
-from .layout_manager import LayoutManager
-from .slide_builder import SlideBuilder
-from .pptx_builder import PPTXBuilder
+import importlib
+
+# 名称 -> 所在子模块
+_LAZY = {
+    'FontCalculator': 'font_calculator',
+    'get_font_calculator': 'font_calculator',
+    'ContentRenderer': 'content_renderer',
+    'LayoutManager': 'layout_manager',
+    'SlideBuilder': 'slide_builder',
+    'PPTXBuilder': 'pptx_builder',
+}
+
+__all__ = ['FontCalculator', 'get_font_calculator', 'ContentRenderer', 'LayoutManager', 'SlideBuilder', 'PPTXBuilder']
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module('.' + module_name, __name__), name)
+    # 缓存到模块全局，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
 
-__all__ = ['FontCalculator', 'ContentRenderer', 'LayoutManager', 'SlideBuilder', 'PPTXBuilder']
+def __dir__():
+    return sorted({*globals(), *__all__})
@@ -2,13 +2,103 @@
 内容渲染器 - 负责具体内容的渲染（文本、图片、表格）
 """
 
+import io
 import os
+import re
+from bisect import bisect_right
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import accumulate
 from typing import List, Optional
 from pptx import Presentation
-from pptx.util import Inches, Pt
+from pptx.util import Pt
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
 from pptx.dml.color import RGBColor
 
+from .logger import get_logger
+
+
+# 英寸 -> EMU；python-pptx 的位置/尺寸参数直接接受整数 EMU，无需构造 Inches 对象
+_EMU_PER_INCH = 914400
+
+
+def _in(value: float) -> int:
+    return int(value * _EMU_PER_INCH)
+
+
+# 渲染过程中反复使用的常量，避免在循环中重复构造
+_COLOR_DARK = RGBColor(0x44, 0x44, 0x44)
+_COLOR_CAPTION = RGBColor(0x66, 0x66, 0x66)
+_PT_6 = Pt(6)
+_PT_8 = Pt(8)
+_PT_14 = Pt(14)
+_CAP_H = _in(0.3)  # 标题文本框高度
+_PAGE_BOTTOM = 7.5  # 假设页面高度为7.5英寸
+_ALIGN_CENTER = PP_ALIGN.CENTER
+_ANCHOR_MID = MSO_ANCHOR.MIDDLE
+_ALIGN_MAP = {
+    'left': PP_ALIGN.LEFT,
+    'center': PP_ALIGN.CENTER,
+    'right': PP_ALIGN.RIGHT,
+    'justify': PP_ALIGN.JUSTIFY
+}
+
+
+# 全角字符（中日韩文字、全角标点等）按2个半角宽度计算
+_WIDE_RE = re.compile(
+    '[\u1100-\u115f\u2e80-\u303e\u3041-\u33ff\u3400-\u4dbf\u4e00-\u9fff'
+    '\ua960-\ua97f\uac00-\ud7a3\uf900-\ufaff\ufe30-\ufe4f\uff00-\uff60\uffe0-\uffe6]+'
+)
+
+
+@lru_cache(maxsize=2048)
+def _wrap_text(text: str, max_chars_per_line: int = 42) -> str:
+    """
+    按显示宽度折行（全角字符计2列，半角计1列），优先在空格处断行，兼容中英文混排
+    
+    max_chars_per_line 按全角字符计，即每行最多 2*max_chars_per_line 列，
+    与 LayoutManager.estimate_text_block_height 按方块字估算的每行字数保持一致
+    """
+    n = len(text)
+    if n <= max_chars_per_line:
+        return text
+    max_cols = 2 * max_chars_per_line
+    # cum[i] 为 text[:i+1] 的累计宽度；纯半角文本直接用 range 表示，无需逐字计算
+    if _WIDE_RE.search(text) is None:
+        if n <= max_cols:
+            return text
+        widths = None
+        cum = range(1, n + 1)
+    else:
+        widths = [1] * n
+        for m in _WIDE_RE.finditer(text):
+            widths[m.start():m.end()] = [2] * (m.end() - m.start())
+        cum = list(accumulate(widths))
+    
+    def breakable(i):
+        # text[i] 前后可以断行：空格或全角字符
+        return text[i] == ' ' or (widths is not None and widths[i] == 2)
+    
+    lines = []
+    start, used = 0, 0
+    while cum[-1] - used > max_cols:
+        end = max(bisect_right(cum, used + max_cols), start + 1)
+        cut = end
+        if text[end] == ' ':
+            cut = end + 1
+        elif not breakable(end):
+            # 断点落在英文单词内部时回退到该单词之前；中文之间可在列宽处直接断行
+            p = end
+            while p > start and not breakable(p - 1):
+                p -= 1
+            if p > start:
+                cut = p
+        lines.append(text[start:cut].rstrip())
+        start, used = cut, cum[cut - 1]
+    if start < n:
+        lines.append(text[start:])
+    return '\n'.join(lines)
+
 
 class ContentRenderer:
     """内容渲染器，负责文本、图片、表格的具体渲染"""
@@ -17,34 +107,93 @@ class ContentRenderer:
         self.prs = presentation
         self.font_calculator = font_calculator
         self.md_base_dir = None
+        # slide -> 索引映射缓存，幻灯片数量变化时重建
+        self._slide_idx_map = {}
+        self._slide_count_when_cached = -1
+        # 标题字号与内容无关，首次使用时计算一次
+        self._caption_font_size = None
+        # 图片路径解析结果缓存，避免重复 stat；基础目录变化时清空
+        self._path_cache = {}
+        # 图片文件内容缓存：同一图片在多页重复插入时只读一次文件
+        self._img_bytes_cache = {}
+        # batch() 期间固定的目标幻灯片 (索引, 对象)
+        self._batch_slide = None
     
     def set_md_base_dir(self, md_base_dir: str):
         """设置Markdown文件基础目录，用于解析图片相对路径"""
         self.md_base_dir = md_base_dir
+        self._path_cache.clear()
+    
+    @contextmanager
+    def batch(self, slide_index: int):
+        """批量插入上下文：期间固定目标幻灯片对象，同一页的多次插入不再重复查找"""
+        previous = self._batch_slide
+        try:
+            self._batch_slide = (slide_index, self.prs.slides[slide_index])
+        except IndexError:
+            # 索引无效时不固定，插入方法自行报错处理
+            self._batch_slide = None
+        try:
+            yield
+        finally:
+            self._batch_slide = previous
+    
+    def _slide_at(self, slide_index: int):
+        """按索引获取幻灯片，batch() 期间直接返回固定的对象"""
+        pinned = self._batch_slide
+        if pinned is not None and pinned[0] == slide_index:
+            return pinned[1]
+        return self.prs.slides[slide_index]
     
     def _get_slide_index(self, slide) -> int:
         """根据 slide 对象获取其索引"""
         try:
-            for idx, s in enumerate(self.prs.slides):
-                if s == slide:
-                    return idx
+            slides = self.prs.slides
+            if len(slides) != self._slide_count_when_cached:
+                # Slide 是每次访问时新建的代理对象，使用其背后稳定的 SlidePart 作为键
+                self._slide_idx_map = {id(s.part): i for i, s in enumerate(slides)}
+                self._slide_count_when_cached = len(slides)
+            return self._slide_idx_map.get(id(slide.part), -1)
         except Exception:
-            pass
-        return -1
+            return -1
     
     def _resolve_image_path(self, src: str) -> str:
         """解析图片路径，支持相对路径和绝对路径"""
+        cached = self._path_cache.get(src)
+        if cached is not None:
+            return cached
+        resolved = src
         try:
-            if os.path.isabs(src):
-                return src
-            if self.md_base_dir:
+            if not os.path.isabs(src) and self.md_base_dir:
                 candidate = os.path.join(self.md_base_dir, src)
                 if os.path.exists(candidate):
-                    return candidate
-            # 退一步：相对当前工作目录
-            return src
+                    resolved = candidate
+            # 否则退一步：相对当前工作目录
         except Exception:
             return src
+        self._path_cache[src] = resolved
+        return resolved
+    
+    def _add_caption(self, slide, left: float, top: float, width: float, caption: str):
+        """在元素下方添加居中的灰色标题，top 为元素底部位置"""
+        # 元素底部 + 0.1英寸间距，确保标题不会超过页面底部（0.3英寸是标题高度）
+        caption_top = min(top + 0.1, _PAGE_BOTTOM - 0.3)
+        textbox = slide.shapes.add_textbox(_in(left), _in(caption_top), _in(width), _CAP_H)
+        frame = textbox.text_frame
+        frame.clear()
+        para = frame.paragraphs[0]
+        run = para.add_run()
+        run.text = caption
+        
+        if self._caption_font_size is None:
+            # 使用字体计算器计算标题字体大小（使用合理的可用高度）
+            self._caption_font_size = Pt(self.font_calculator.calculate_optimal_font_size(1.0, 1, 'caption'))
+        font = run.font
+        font.name = '微软雅黑'
+        font.size = self._caption_font_size
+        font.color.rgb = _COLOR_CAPTION  # 灰色
+        para.alignment = _ALIGN_CENTER  # 居中对齐
+        return textbox
     
     def add_text_box(self, slide_index: int, text: str, left: float = 1.0, top: float = 1.0, 
                     width: float = 4.0, height: float = 1.0, font_name: Optional[str] = None, 
@@ -53,8 +202,8 @@ class ContentRenderer:
                     alignment: str = "left") -> Optional[object]:
         """添加文本框"""
         try:
-            slide = self.prs.slides[slide_index]
-            textbox = slide.shapes.add_textbox(Inches(left), Inches(top), Inches(width), Inches(height))
+            slide = self._slide_at(slide_index)
+            textbox = slide.shapes.add_textbox(_in(left), _in(top), _in(width), _in(height))
             frame = textbox.text_frame
             frame.clear()
             para = frame.paragraphs[0]
@@ -76,62 +225,37 @@ class ContentRenderer:
                 if len(hexv) == 6:
                     run.font.color.rgb = RGBColor(int(hexv[0:2], 16), int(hexv[2:4], 16), int(hexv[4:6], 16))
             
-            align_map = {
-                'left': PP_ALIGN.LEFT,
-                'center': PP_ALIGN.CENTER,
-                'right': PP_ALIGN.RIGHT,
-                'justify': PP_ALIGN.JUSTIFY
-            }
-            para.alignment = align_map.get(alignment, PP_ALIGN.LEFT)
+            para.alignment = _ALIGN_MAP.get(alignment, PP_ALIGN.LEFT)
             return textbox
         except Exception as e:
-            print(f"添加文本框失败: {e}")
+            get_logger().echo(f"添加文本框失败: {e}")
             return None
     
     def insert_image(self, slide_index: int, image_path: str, left: float = 1.0, top: float = 1.0, 
                     width: float = None, height: float = None, caption: str = None) -> Optional[object]:
         """插入图片，支持标题"""
         try:
-            slide = self.prs.slides[slide_index]
+            slide = self._slide_at(slide_index)
             img_path = self._resolve_image_path(image_path)
             kwargs = {}
             if width is not None:
-                kwargs['width'] = Inches(width)
+                kwargs['width'] = _in(width)
             if height is not None:
-                kwargs['height'] = Inches(height)
-            pic = slide.shapes.add_picture(img_path, Inches(left), Inches(top), **kwargs)
+                kwargs['height'] = _in(height)
+            data = self._img_bytes_cache.get(img_path)
+            if data is None:
+                with open(img_path, 'rb') as f:
+                    data = f.read()
+                self._img_bytes_cache[img_path] = data
+            pic = slide.shapes.add_picture(io.BytesIO(data), _in(left), _in(top), **kwargs)
             
             # 如果有标题，在图片下方添加标题
             if caption:
-                # 计算标题位置：图片底部 + 0.1英寸间距
-                caption_top = top + (height if height else 2.0) + 0.1
-                # 确保标题不会超过页面底部
-                page_bottom = 7.5  # 假设页面高度为7.5英寸
-                if caption_top + 0.3 > page_bottom:  # 0.3英寸是标题高度
-                    caption_top = page_bottom - 0.3
-                
-                # 添加标题文本框
-                caption_textbox = slide.shapes.add_textbox(
-                    Inches(left), Inches(caption_top), 
-                    Inches(width if width else 4.0), Inches(0.3)
-                )
-                caption_frame = caption_textbox.text_frame
-                caption_frame.clear()
-                caption_para = caption_frame.paragraphs[0]
-                caption_run = caption_para.add_run()
-                caption_run.text = caption
-                
-                # 设置标题格式
-                caption_run.font.name = '微软雅黑'
-                # 使用字体计算器计算标题字体大小（使用合理的可用高度）
-                caption_size = self.font_calculator.calculate_optimal_font_size(1.0, 1, 'caption')
-                caption_run.font.size = Pt(caption_size)
-                caption_run.font.color.rgb = RGBColor(0x66, 0x66, 0x66)  # 灰色
-                caption_para.alignment = PP_ALIGN.CENTER  # 居中对齐
+                self._add_caption(slide, left, top + (height if height else 2.0), width if width else 4.0, caption)
             
             return pic
         except Exception as e:
-            print(f"插入图片失败: {e}")
+            get_logger().echo(f"插入图片失败: {e}")
             return None
     
     def insert_table(self, slide_index: int, rows: int, cols: int, data: Optional[List[List[str]]] = None, 
@@ -139,56 +263,34 @@ class ContentRenderer:
                     caption: str = None) -> Optional[object]:
         """插入表格，支持标题"""
         try:
-            slide = self.prs.slides[slide_index]
-            table_obj = slide.shapes.add_table(rows, cols, Inches(left), Inches(top), Inches(width), Inches(height))
-            table = table_obj.table
+            slide = self._slide_at(slide_index)
+            table_obj = slide.shapes.add_table(rows, cols, _in(left), _in(top), _in(width), _in(height))
+            tbl = table_obj.table
             
             if data is not None:
+                font_name = self.font_calculator.get_font_name() if self.font_calculator else '微软雅黑'
                 for r in range(rows):
+                    row_data = data[r] if r < len(data) else ()
                     for c in range(cols):
-                        cell = table.cell(r, c)
-                        text_val = ''
-                        if data and r < len(data) and c < len(data[r]):
-                            text_val = str(data[r][c])
-                        cell.text = text_val
-                        for paragraph in cell.text_frame.paragraphs:
-                            for run in paragraph.runs:
-                                run.font.name = '微软雅黑'
-                                run.font.size = Pt(14)
-                            paragraph.alignment = PP_ALIGN.CENTER
-                        cell.vertical_anchor = MSO_ANCHOR.MIDDLE
+                        cell = tbl.cell(r, c)
+                        cell.text = str(row_data[c]) if c < len(row_data) else ''
+                        # 单元格文本为单段单run，直接设置首个run即可（空文本没有run）
+                        paragraph = cell.text_frame.paragraphs[0]
+                        runs = paragraph.runs
+                        if runs:
+                            font = runs[0].font
+                            font.name = font_name
+                            font.size = _PT_14
+                        paragraph.alignment = _ALIGN_CENTER
+                        cell.vertical_anchor = _ANCHOR_MID
             
             # 如果有标题，在表格下方添加标题
             if caption:
-                # 计算标题位置：表格底部 + 0.1英寸间距
-                caption_top = top + height + 0.1
-                # 确保标题不会超过页面底部
-                page_bottom = 7.5  # 假设页面高度为7.5英寸
-                if caption_top + 0.3 > page_bottom:  # 0.3英寸是标题高度
-                    caption_top = page_bottom - 0.3
-                
-                # 添加标题文本框
-                caption_textbox = slide.shapes.add_textbox(
-                    Inches(left), Inches(caption_top), 
-                    Inches(width), Inches(0.3)
-                )
-                caption_frame = caption_textbox.text_frame
-                caption_frame.clear()
-                caption_para = caption_frame.paragraphs[0]
-                caption_run = caption_para.add_run()
-                caption_run.text = caption
-                
-                # 设置标题格式
-                caption_run.font.name = '微软雅黑'
-                # 使用字体计算器计算标题字体大小（使用合理的可用高度）
-                caption_size = self.font_calculator.calculate_optimal_font_size(1.0, 1, 'caption')
-                caption_run.font.size = Pt(caption_size)
-                caption_run.font.color.rgb = RGBColor(0x66, 0x66, 0x66)  # 灰色
-                caption_para.alignment = PP_ALIGN.CENTER  # 居中对齐
+                self._add_caption(slide, left, top + height, width, caption)
             
             return table_obj
         except Exception as e:
-            print(f"插入表格失败: {e}")
+            get_logger().echo(f"插入表格失败: {e}")
             return None
     
     def add_text_content_left_aligned(self, slide, text_blocks, content_top, content_height, font_calculator):
@@ -200,23 +302,15 @@ class ContentRenderer:
         text_frame.clear()
         text_frame.word_wrap = True  # 启用自动换行
         
-        def _wrap_text(text: str, max_chars_per_line: int = 42) -> str:
-            # 简单基于字符数的折行，兼容中英文混排
-            lines = []
-            current = ''
-            for ch in text:
-                current += ch
-                if len(current) >= max_chars_per_line and ch == ' ':
-                    lines.append(current.rstrip())
-                    current = ''
-            if current:
-                lines.append(current)
-            return '\n'.join(lines)
-        
         # 创建第一个段落
         first_para = text_frame.paragraphs[0]
         first_para_used = False
         
+        # 字号只依赖整体内容量，在循环外一次性计算
+        list_font_size = Pt(font_calculator.calculate_optimal_font_size(content_height, len(text_blocks), 'text'))
+        total_text_items = sum(len(b.get('items', [])) if b['type'] == 'list' else 1 for b in text_blocks)
+        para_font_size = Pt(font_calculator.calculate_optimal_font_size(content_height, total_text_items, 'text'))
+        
         for block in text_blocks:
             if block['type'] == 'list':
                 for item in block['items']:
@@ -228,12 +322,11 @@ class ContentRenderer:
                     run = para.add_run()
                     run.text = f"• {_wrap_text(item)}"
                     run.font.name = '微软雅黑'
-                    font_size = font_calculator.calculate_optimal_font_size(content_height, len(text_blocks), 'text')
-                    run.font.size = Pt(font_size)
+                    run.font.size = list_font_size
                     run.font.bold = True
-                    run.font.color.rgb = RGBColor(0x44, 0x44, 0x44)
+                    run.font.color.rgb = _COLOR_DARK
                     para.alignment = PP_ALIGN.LEFT
-                    para.space_after = Pt(6)
+                    para.space_after = _PT_6
             elif block['type'] == 'paragraph':
                 if not first_para_used:
                     para = first_para
@@ -243,11 +336,8 @@ class ContentRenderer:
                 run = para.add_run()
                 run.text = _wrap_text(block['text'])
                 run.font.name = '微软雅黑'
-                total_text_items = sum(len(block.get('items', [])) if block['type'] == 'list' 
-                                     else 1 for block in text_blocks)
-                font_size = font_calculator.calculate_optimal_font_size(content_height, total_text_items, 'text')
-                run.font.size = Pt(font_size)
+                run.font.size = para_font_size
                 run.font.bold = True
-                run.font.color.rgb = RGBColor(0x44, 0x44, 0x44)
+                run.font.color.rgb = _COLOR_DARK
                 para.alignment = PP_ALIGN.LEFT
-                para.space_after = Pt(8)
\ No newline at end of file
+                para.space_after = _PT_8
\ No newline at end of file
@@ -3,9 +3,90 @@
 """
 
 import os
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
 import yaml
 from pptx.util import Pt
 
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
+# 已解析的配置缓存: (绝对路径, 修改时间) -> 配置字典（只读，多个实例共享）
+_CONFIG_CACHE = {}
+
+# 分档阈值：bisect_left(阈值, x) 即 x 超过的阈值个数，对应倍数元组的下标
+_H_THRESH_TEXT = (1.5, 3.0, 5.0)
+_H_THRESH_CAPTION = (0.5, 1.0)
+_CONTENT_THRESH = (2, 5, 10)
+_COL_THRESH = (3, 5)
+
+_DEFAULT_BASE_SIZES = {
+    'parent_title': 26,   # 父标题（章节分隔页标题）
+    'title': 20,          # 子章节标题
+    'text': 18,           # 正文内容（中文友好大小）
+    'table_header': 18,   # 表格标题（中文友好）
+    'table_data': 16      # 表格数据（中文友好）
+}
+
+
+@dataclass(frozen=True)
+class TableFontConfig:
+    """表格字体调整参数"""
+    cell_height_ratio: float
+    base_size_multiplier: float
+    col_adjustments: Tuple[float, float, float]  # normal / many / too_many
+
+
+@dataclass(frozen=True)
+class FontConfig:
+    """加载时一次性展平的字体配置，计算时只做属性访问"""
+    base_sizes: Mapping[str, int]
+    size_ranges: Mapping[str, tuple]
+    height_mul_text: Tuple[float, float, float, float]  # small / medium / large / extra_large
+    height_mul_cap: Tuple[float, float, float]          # small / medium / large
+    content_mul: Tuple[float, float, float, float]      # few / normal / many / too_many
+    table: TableFontConfig
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'FontConfig':
+        """由YAML解析出的字典构建，缺失项使用默认值"""
+        size_ranges = {}
+        for key, value in (config.get('size_ranges') or {}).items():
+            if isinstance(value, list) and len(value) == 2:
+                size_ranges[key] = tuple(value)
+            else:
+                size_ranges[key] = value
+        size_ranges.setdefault('default', (14, 22))
+
+        dynamic_config = config.get('dynamic_adjustment') or {}
+        hm = dynamic_config.get('height_multipliers') or {}
+        height_mul_text = (hm.get('small', 0.75), hm.get('medium', 0.9),
+                           hm.get('large', 1.0), hm.get('extra_large', 1.2))
+        cm = dynamic_config.get('content_multipliers') or {}
+        table_config = dynamic_config.get('table_adjustment') or {}
+        col_adj = table_config.get('col_adjustments') or {}
+
+        return cls(
+            base_sizes=MappingProxyType(dict(config.get('base_sizes') or _DEFAULT_BASE_SIZES)),
+            size_ranges=MappingProxyType(size_ranges),
+            height_mul_text=height_mul_text,
+            height_mul_cap=height_mul_text[:3],
+            content_mul=(cm.get('few', 1.2), cm.get('normal', 1.0),
+                         cm.get('many', 0.9), cm.get('too_many', 0.8)),
+            table=TableFontConfig(
+                cell_height_ratio=table_config.get('cell_height_ratio', 0.6),
+                base_size_multiplier=table_config.get('base_size_multiplier', 1.5),
+                col_adjustments=(col_adj.get('normal', 1.0), col_adj.get('many', 0.9),
+                                 col_adj.get('too_many', 0.8)),
+            ),
+        )
+
 
 class FontCalculator:
     """字体大小计算器，根据内容类型、可用空间等智能计算最佳字体大小"""
@@ -13,28 +94,16 @@ class FontCalculator:
     def __init__(self, config_path=None):
         # 加载配置文件
         self.config = self._load_config(config_path)
+        self._cfg = FontConfig.from_dict(self.config)
         
-        # 基础字体大小设定（从配置文件加载，支持动态覆盖）
-        self.base_sizes = self.config.get('base_sizes', {
-            'parent_title': 26,   # 父标题（章节分隔页标题）
-            'title': 20,          # 子章节标题
-            'text': 18,           # 正文内容（中文友好大小）
-            'table_header': 18,   # 表格标题（中文友好）
-            'table_data': 16      # 表格数据（中文友好）
-        })
+        # 基础字体大小与大小范围（从配置文件加载，支持动态覆盖）
+        # 使用可变副本，update_* 不会影响共享的配置
+        self.base_sizes = dict(self._cfg.base_sizes)
+        self.size_ranges = dict(self._cfg.size_ranges)
         
-        # 字体大小范围限制（从配置文件加载，支持动态覆盖）
-        self.size_ranges = {}
-        config_ranges = self.config.get('size_ranges', {})
-        for key, value in config_ranges.items():
-            if isinstance(value, list) and len(value) == 2:
-                self.size_ranges[key] = tuple(value)
-            else:
-                self.size_ranges[key] = value
-        
-        # 设置默认范围
-        if 'default' not in self.size_ranges:
-            self.size_ranges['default'] = (14, 22)
+        # 计算结果只依赖入参与当前配置，按实例缓存；配置更新时清空
+        self._optimal_cache = lru_cache(maxsize=512)(self._compute_optimal_font_size)
+        self._table_cache = lru_cache(maxsize=512)(self._compute_table_font_size)
     
     def _load_config(self, config_path=None):
         """加载字体配置文件"""
@@ -45,8 +114,14 @@ class FontCalculator:
         
         try:
             if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    return yaml.safe_load(f) or {}
+                config_path = os.path.abspath(config_path)
+                key = (config_path, os.stat(config_path).st_mtime)
+                config = _CONFIG_CACHE.get(key)
+                if config is None:
+                    with open(config_path, 'r', encoding='utf-8') as f:
+                        config = yaml.load(f, Loader=_Loader) or {}
+                    _CONFIG_CACHE[key] = config
+                return config
             else:
                 print(f"警告: 字体配置文件不存在: {config_path}")
                 return {}
@@ -57,6 +132,7 @@ class FontCalculator:
     def update_base_sizes(self, **kwargs):
         """动态更新基础字体大小（优先级高于配置文件）"""
         self.base_sizes.update(kwargs)
+        self._invalidate_cache()
     
     def update_size_ranges(self, **kwargs):
         """动态更新字体大小范围（优先级高于配置文件）"""
@@ -65,49 +141,30 @@ class FontCalculator:
                 self.size_ranges[key] = tuple(value)
             else:
                 self.size_ranges[key] = value
+        self._invalidate_cache()
+    
+    def _invalidate_cache(self):
+        """配置变化后清空计算缓存"""
+        self._optimal_cache.cache_clear()
+        self._table_cache.cache_clear()
     
     def calculate_optimal_font_size(self, available_height, content_amount, content_type):
         """根据可用空间和内容量计算最佳字体大小"""
+        return self._optimal_cache(available_height, content_amount, content_type)
+    
+    def _compute_optimal_font_size(self, available_height, content_amount, content_type):
         base_size = self.base_sizes.get(content_type, 16)
         
-        # 从配置文件获取动态调整参数
-        dynamic_config = self.config.get('dynamic_adjustment', {})
-        height_multipliers = dynamic_config.get('height_multipliers', {
-            'small': 0.75, 'medium': 0.9, 'large': 1.0, 'extra_large': 1.2
-        })
-        content_multipliers = dynamic_config.get('content_multipliers', {
-            'few': 1.2, 'normal': 1.0, 'many': 0.9, 'too_many': 0.8
-        })
-        
-        # 根据可用高度调整
-        # 对于caption类型，使用更宽松的高度判断
+        # 根据可用高度调整（按阈值分档：small/medium/large/extra_large）
+        # 对于caption类型，使用更宽松的高度判断，最高只到large档
         if content_type == 'caption':
-            if available_height <= 0.5:  # 标题空间很小
-                size_multiplier = height_multipliers.get('small', 0.75)
-            elif available_height <= 1.0:  # 标题空间中等
-                size_multiplier = height_multipliers.get('medium', 0.9)
-            else:  # 标题空间充足
-                size_multiplier = height_multipliers.get('large', 1.0)
+            size_multiplier = self._cfg.height_mul_cap[bisect_left(_H_THRESH_CAPTION, available_height)]
         else:
-            if available_height <= 1.5:  # 空间很小
-                size_multiplier = height_multipliers.get('small', 0.75)
-            elif available_height <= 3.0:  # 空间中等
-                size_multiplier = height_multipliers.get('medium', 0.9)
-            elif available_height <= 5.0:  # 空间充足
-                size_multiplier = height_multipliers.get('large', 1.0)
-            else:  # 空间很大
-                size_multiplier = height_multipliers.get('extra_large', 1.2)
+            size_multiplier = self._cfg.height_mul_text[bisect_left(_H_THRESH_TEXT, available_height)]
         
-        # 根据内容量调整
+        # 根据内容量调整（仅text类型：few/normal/many/too_many）
         if content_type == 'text':
-            if content_amount <= 2:  # 内容很少
-                content_multiplier = content_multipliers.get('few', 1.2)
-            elif content_amount <= 5:  # 内容适中
-                content_multiplier = content_multipliers.get('normal', 1.0)
-            elif content_amount <= 10:  # 内容较多
-                content_multiplier = content_multipliers.get('many', 0.9)
-            else:  # 内容很多
-                content_multiplier = content_multipliers.get('too_many', 0.8)
+            content_multiplier = self._cfg.content_mul[bisect_left(_CONTENT_THRESH, content_amount)]
         else:
             content_multiplier = 1.0
         
@@ -130,33 +187,23 @@ class FontCalculator:
     
     def calculate_table_font_size(self, table_height, rows, cols, content_type):
         """根据表格尺寸计算最优字体大小，让文字占满大部分空间（中文友好）"""
+        return self._table_cache(table_height, rows, cols, content_type)
+    
+    def _compute_table_font_size(self, table_height, rows, cols, content_type):
         base_size = self.base_sizes.get(content_type, 18 if content_type == 'table_header' else 16)
         
-        # 从配置文件获取表格调整参数
-        dynamic_config = self.config.get('dynamic_adjustment', {})
-        table_config = dynamic_config.get('table_adjustment', {})
-        cell_height_ratio = table_config.get('cell_height_ratio', 0.6)
-        base_size_multiplier = table_config.get('base_size_multiplier', 1.5)
-        col_adjustments = table_config.get('col_adjustments', {
-            'normal': 1.0, 'many': 0.9, 'too_many': 0.8
-        })
-        
         # 计算单元格平均高度
         cell_height = table_height / rows if rows > 0 else 1.0
         
         # 根据单元格高度计算最优字体大小（字体高度约为字号的1.2倍）
-        max_font_by_height = int((cell_height * 72 * cell_height_ratio))  # 英寸转点
+        table_cfg = self._cfg.table
+        max_font_by_height = int((cell_height * 72 * table_cfg.cell_height_ratio))  # 英寸转点
         
-        # 根据列数调整（列太多时字体要小一些）
-        if cols > 5:
-            col_adjustment = col_adjustments.get('too_many', 0.8)
-        elif cols > 3:
-            col_adjustment = col_adjustments.get('many', 0.9)
-        else:
-            col_adjustment = col_adjustments.get('normal', 1.0)
+        # 根据列数调整（列太多时字体要小一些：normal/many/too_many）
+        col_adjustment = table_cfg.col_adjustments[bisect_left(_COL_THRESH, cols)]
         
         # 计算最终字体大小
-        optimal_size = int(min(base_size * base_size_multiplier, max_font_by_height) * col_adjustment)
+        optimal_size = int(min(base_size * table_cfg.base_size_multiplier, max_font_by_height) * col_adjustment)
         
         # 设置表格字体的合理范围（中文友好）
         min_size, max_size = self.size_ranges.get(content_type, self.size_ranges['default'])
@@ -186,4 +233,15 @@ class FontCalculator:
             'gap_list': 6,
             'gap_paragraph': 8,
             'min_chars_per_line': 8
-        })
\ No newline at end of file
+        })
+
+
+@lru_cache(maxsize=4)
+def get_font_calculator(config_path: Optional[str] = None) -> FontCalculator:
+    """
+    获取进程内共享的FontCalculator实例，配置只解析一次
+    
+    注意：共享实例上的 update_base_sizes/update_size_ranges 会影响所有使用者，
+    需要单独调整字号时请直接构造 FontCalculator。
+    """
+    return FontCalculator(config_path)
@@ -2,167 +2,132 @@
 布局管理器 - 负责各种布局策略的选择和执行
 """
 
+import logging
+from functools import lru_cache
+from itertools import islice
+
 from .content_renderer import ContentRenderer
 from .font_calculator import FontCalculator
 
+log = logging.getLogger(__name__)
+
+# 图片排布常量：单张按16:9、多张按4:3估算，最多3张，间距0.3英寸
+_ASPECT_SINGLE = 16.0 / 9.0
+_ASPECT_MULTI = 4.0 / 3.0
+_MAX_IMAGES = 3
+_IMG_GAP = 0.3
+
+# 插入表格的最大规模
+_TABLE_MAX_COLS = 5
+_TABLE_MAX_ROWS = 8
+
+
+@lru_cache(maxsize=128)
+def _image_grid(count: int, total_width_milli: int, images_height_milli: int) -> tuple:
+    """计算图片区域内每张图片的 (宽度, 估计高度)；尺寸以千分之一英寸整数传入，便于缓存"""
+    total_width = total_width_milli / 1000.0
+    images_height = images_height_milli / 1000.0
+    if count == 1:
+        # 单张图片：高度优先，假设16:9比例
+        width_each = min(total_width, images_height * _ASPECT_SINGLE, 10.0)
+        return width_each, width_each / _ASPECT_SINGLE
+    # 多张图片：等宽排列
+    width_by_row = (total_width - _IMG_GAP * (count - 1)) / count
+    width_by_height = images_height * _ASPECT_MULTI
+    width_each = min(width_by_row, width_by_height, 5.0)
+    return width_each, width_each / _ASPECT_MULTI
+
 
 class LayoutManager:
     """布局管理器，负责根据内容类型选择和执行最佳布局策略"""
     
+    # 布局分派表：(有图片, 表格数(最多计2), 有文字) -> (布局方法名, 参数名)
+    _LAYOUT_DISPATCH = {
+        (True, 0, False): ('layout_images_only', ('images',)),                       # 仅图片
+        (True, 0, True): ('layout_text_and_images', ('text', 'images')),             # 文字 + 图片（常见）
+        (True, 1, False): ('layout_table_and_images', ('table', 'images')),          # 表格 + 图片
+        (True, 1, True): ('layout_text_table_images', ('text', 'table', 'images')),  # 文字 + 表格 + 图片
+        (True, 2, True): ('layout_text_table_images', ('text', 'table', 'images')),
+        (False, 1, False): ('layout_table_only', ('table',)),                        # 只有表格
+        (False, 1, True): ('layout_text_and_table', ('text', 'table')),              # 文字 + 表格
+    }
+    # 多表格或复杂内容（无图片）
+    _LAYOUT_DEFAULT = ('layout_complex_content', ('text', 'tables'))
+    
+    # 页面宽度（英寸，16:9）
+    _SLIDE_W = 13.33
+    
     def __init__(self, content_renderer: ContentRenderer, font_calculator: FontCalculator):
         self.renderer = content_renderer
         self.font_calc = font_calculator
+        # 文本估算参数 (正文字号, 行高, 列表段后距, 段落段后距, 每行最少字符数)，首次使用时计算
+        self._text_cfg = None
+        # 表格位置缓存：同一文档中各页的内容区域基本一致
+        self._geom_cache = {}
     
     def add_content_auto_layout(self, slide, content_blocks, content_top, content_height):
         """智能布局自动匹配：根据内容类型选择最佳布局"""
         if not content_blocks:
             return
         
-        # 分析内容类型
-        text_blocks = [block for block in content_blocks if block['type'] in ['list', 'paragraph']]
-        table_blocks = [block for block in content_blocks if block['type'] == 'table']
-        image_blocks = [block for block in content_blocks if block['type'] == 'image']
+        # 分析内容类型（单次遍历，按类型分桶；列表与段落共用一个桶以保持原有顺序）
+        text_blocks, table_blocks, image_blocks = [], [], []
+        append_by_type = {
+            'list': text_blocks.append,
+            'paragraph': text_blocks.append,
+            'table': table_blocks.append,
+            'image': image_blocks.append,
+        }
+        for block in content_blocks:
+            append = append_by_type.get(block['type'])
+            if append is not None:
+                append(block)
         
-        # 计算内容量
-        text_content_amount = sum(len(block.get('items', [])) if block['type'] == 'list' 
-                                 else 1 if block['type'] == 'paragraph' else 0 
-                                 for block in text_blocks)
-        table_count = len(table_blocks)
+        # 计算内容量；图片最多放置 _MAX_IMAGES 张
+        text_content_amount = sum(len(b.get('items') or ()) if b['type'] == 'list' else 1 for b in text_blocks)
         image_count = len(image_blocks)
+        del image_blocks[_MAX_IMAGES:]
+        table_count = len(table_blocks)
         
-        print(f"    内容分析: {text_content_amount}条文字, {table_count}个表格, {image_count}张图片")
+        log.debug("内容分析: %d条文字, %d个表格, %d张图片", text_content_amount, table_count, image_count)
         
-        # 根据内容类型选择布局策略
-        # 仅图片
-        if image_count > 0 and table_count == 0 and text_content_amount == 0:
-            self.layout_images_only(slide, image_blocks, content_top, content_height)
-            return
-
-        # 文字 + 图片（常见）
-        if image_count > 0 and table_count == 0 and text_content_amount > 0:
-            self.layout_text_and_images(slide, text_blocks, image_blocks, content_top, content_height)
-            return
-
-        # 表格 + 图片
-        if image_count > 0 and table_count == 1 and text_content_amount == 0:
-            self.layout_table_and_images(slide, table_blocks[0], image_blocks, content_top, content_height)
-            return
-
-        # 文字 + 表格 + 图片
-        if image_count > 0 and table_count >= 1 and text_content_amount > 0:
-            self.layout_text_table_images(slide, text_blocks, table_blocks[0], image_blocks, content_top, content_height)
-            return
-
-        # 只有表格
-        if table_count == 1 and text_content_amount == 0:
-            self.layout_table_only(slide, table_blocks[0], content_top, content_height)
-            return
-
-        # 文字 + 表格
-        if table_count == 1 and text_content_amount > 0:
-            self.layout_text_and_table(slide, text_blocks, table_blocks[0], content_top, content_height)
-            return
-
-        # 多表格或复杂内容（无图片）
-        self.layout_complex_content(slide, text_blocks, table_blocks, content_top, content_height)
+        # 根据内容类型选择布局策略：(有图片, 表格数(最多计2), 有文字) -> (布局方法, 参数)
+        key = (image_count > 0, min(table_count, 2), text_content_amount > 0)
+        method_name, arg_names = self._LAYOUT_DISPATCH.get(key, self._LAYOUT_DEFAULT)
+        operands = {
+            'text': text_blocks,
+            'table': table_blocks[0] if table_blocks else None,
+            'tables': table_blocks,
+            'images': image_blocks,
+        }
+        # 同一页上的多次插入共用一次幻灯片查找
+        with self.renderer.batch(self.renderer._get_slide_index(slide)):
+            getattr(self, method_name)(slide, *[operands[a] for a in arg_names], content_top, content_height)
     
     def layout_images_only(self, slide, image_blocks, content_top, content_height):
         """布局1: 纯图片内容"""
-        print(f"    应用布局: 纯图片布局")
+        log.debug("应用布局: 纯图片布局")
         # 图片区域占用大部分空间
         images_top = content_top + 0.1
         images_height = min(content_height * 0.85, content_height)
         
         # 直接使用insert_image插入图片，确保高度不超过可用区域
-        try:
-            max_images = 3
-            imgs = (image_blocks or [])[:max_images]
-            count = len(imgs)
-            if count == 0:
-                return
-            
-            total_width = 11.0
-            gap = 0.3
-            idx = self.renderer._get_slide_index(slide)
-            
-            if count == 1:
-                # 单张图片：高度优先，假设16:9比例
-                assumed_aspect = 16.0 / 9.0
-                width_each = min(total_width, images_height * assumed_aspect, 10.0)
-                left0 = (13.33 - width_each) / 2
-                # 垂直居中到可用区域
-                est_height = width_each / assumed_aspect
-                top0 = images_top + max(0.0, (images_height - est_height) / 2)
-                path = self.renderer._resolve_image_path(imgs[0]['src'])
-                # 使用计算出的高度，确保不超过可用区域
-                pic_height = min(est_height, images_height)
-                # 获取图片标题
-                image_caption = imgs[0].get('caption', f"图片 1")
-                self.renderer.insert_image(idx, path, left0, top0, width_each, pic_height, image_caption)
-                return
-            
-            # 多张图片：等宽排列
-            assumed_aspect = 4.0 / 3.0
-            width_by_row = (total_width - gap * (count - 1)) / count
-            width_by_height = images_height * assumed_aspect
-            width_each = min(width_by_row, width_by_height, 5.0)
-            est_height = width_each / assumed_aspect
-            top0 = images_top + max(0.0, (images_height - est_height) / 2)
-            # 左边距统一为1.0，与文字区域对齐
-            start_left = 1.0
-            for i, block in enumerate(imgs):
-                path = self.renderer._resolve_image_path(block['src'])
-                left = start_left + i * (width_each + gap)
-                # 使用计算出的高度，确保不超过可用区域
-                pic_height = min(est_height, images_height)
-                # 获取图片标题
-                image_caption = block.get('caption', f"图片 {i+1}")
-                self.renderer.insert_image(idx, path, left, top0, width_each, pic_height, image_caption)
-            print(f"已添加图片 {count} 张，等宽布局")
-        except Exception as e:
-            print(f"添加图片时出错: {e}")
+        idx = self.renderer._get_slide_index(slide)
+        self._place_images(idx, image_blocks, 1.0, 11.0, images_top, images_height)
     
     def layout_table_only(self, slide, table_block, content_top, content_height):
         """布局2: 纯表格内容 - 表格居中，垂直居中"""
-        print(f"    应用布局: 纯表格布局")
-        # 计算垂直居中位置
-        # 动态估计表格高度：根据可用高度与行列数自适应
-        try:
-            lines = [ln for ln in table_block.get('text', '').split('\n') if ln.strip()]
-            header = lines[0] if lines else ''
-            cols = max(1, len([c for c in header.split('|') if c.strip()]))
-            rows = max(1, 1 + max(0, len(lines) - 1))
-        except Exception:
-            cols, rows = 3, 4
-        base_row_h = max(0.4, min(0.7, 0.6 - 0.02 * max(0, rows - 4)))
-        required_h = base_row_h * min(rows, 6) + 0.2
-        table_height = max(0.8, min(content_height * 0.9, required_h))
-        vertical_margin = max(0.0, (content_height - table_height) / 2)
-        table_top_centered = content_top + vertical_margin
+        log.debug("应用布局: 纯表格布局")
+        # 动态估计表格高度并垂直居中
+        cols, rows = self._ensure_table_geometry(table_block)
+        table_top_centered, table_height = self._table_box(content_top, content_height, rows, 0.9)
         
-        # 使用insert_table替代_add_table_grid
         idx = self.renderer._get_slide_index(slide)
-        # 获取表格标题
-        table_caption = table_block.get('caption', f"表格 1")
-        # 计算表格居中位置
-        slide_width = 13.33
-        table_width = min(10.0, cols * 2.0)
-        table_left = (slide_width - table_width) / 2
-        self.renderer.insert_table(
-            slide_index=idx,
-            rows=rows,
-            cols=cols,
-            data=None,
-            left=table_left,
-            top=table_top_centered,
-            width=table_width,
-            height=table_height,
-            caption=table_caption
-        )
+        self._insert_table_block(idx, table_block, table_top_centered, table_height)
     
     def layout_text_and_table(self, slide, text_blocks, table_block, content_top, content_height):
         """布局3: 文字+表格 - 文字顶部靠左，表格中下方居中"""
-        print(f"    应用布局: 文字+表格布局")
+        log.debug("应用布局: 文字+表格布局")
         
         # 智能分配空间比例
         text_ratio = 0.3 if len(text_blocks) <= 2 else 0.4  # 文字少时占30%，多时占40%
@@ -174,42 +139,15 @@ class LayoutManager:
             text_height = content_height * text_ratio
             self.renderer.add_text_content_left_aligned(slide, text_blocks, content_top, text_height, self.font_calc)
         
-        # 表格区域（中下方居中）
-        table_top = content_top + content_height * (text_ratio + gap_ratio)
-        # 动态估计高度
-        try:
-            lines = [ln for ln in table_block.get('text', '').split('\n') if ln.strip()]
-            header = lines[0] if lines else ''
-            cols = max(1, len([c for c in header.split('|') if c.strip()]))
-            rows = max(1, 1 + max(0, len(lines) - 1))
-        except Exception:
-            cols, rows = 3, 4
-        base_row_h = max(0.4, min(0.7, 0.6 - 0.02 * max(0, rows - 4)))
-        required_h = base_row_h * min(rows, 6) + 0.2
-        table_height = max(0.8, min(content_height * table_ratio, required_h))
-        # 使用insert_table替代_add_table_grid
+        # 表格区域（中下方居中），动态估计高度
+        cols, rows = self._ensure_table_geometry(table_block)
+        table_top, table_height = self._table_box(content_top, content_height, rows, table_ratio, text_ratio + gap_ratio)
         idx = self.renderer._get_slide_index(slide)
-        # 获取表格标题
-        table_caption = table_block.get('caption', f"表格 1")
-        # 计算表格居中位置
-        slide_width = 13.33
-        table_width = min(10.0, cols * 2.0)
-        table_left = (slide_width - table_width) / 2
-        self.renderer.insert_table(
-            slide_index=idx,
-            rows=rows,
-            cols=cols,
-            data=None,
-            left=table_left,
-            top=table_top,
-            width=table_width,
-            height=table_height,
-            caption=table_caption
-        )
+        self._insert_table_block(idx, table_block, table_top, table_height)
     
     def layout_text_and_images(self, slide, text_blocks, image_blocks, content_top, content_height):
         """布局4: 文字+图片 - 文字顶部，图片下方居中"""
-        print(f"    应用布局: 文字+图片布局")
+        log.debug("应用布局: 文字+图片布局")
         text_ratio = 0.35 if len(text_blocks) > 2 else 0.3
         gap_ratio = 0.08
         images_ratio = 1.0 - text_ratio - gap_ratio
@@ -225,57 +163,12 @@ class LayoutManager:
         images_top = text_bottom + (available_height - images_height) / 2
         
         # 直接使用insert_image插入图片，确保高度不超过可用区域
-        try:
-            max_images = 3
-            imgs = (image_blocks or [])[:max_images]
-            count = len(imgs)
-            if count == 0:
-                return
-            
-            total_width = 11.0
-            gap = 0.3
-            idx = self.renderer._get_slide_index(slide)
-            
-            if count == 1:
-                # 单张图片：高度优先，假设16:9比例
-                assumed_aspect = 16.0 / 9.0
-                width_each = min(total_width, images_height * assumed_aspect, 10.0)
-                left0 = (13.33 - width_each) / 2
-                # 垂直居中到可用区域
-                est_height = width_each / assumed_aspect
-                top0 = images_top + max(0.0, (images_height - est_height) / 2)
-                path = self.renderer._resolve_image_path(imgs[0]['src'])
-                # 使用计算出的高度，确保不超过可用区域
-                pic_height = min(est_height, images_height)
-                # 获取图片标题
-                image_caption = imgs[0].get('caption', f"图片 1")
-                self.renderer.insert_image(idx, path, left0, top0, width_each, pic_height, image_caption)
-                return
-            
-            # 多张图片：等宽排列
-            assumed_aspect = 4.0 / 3.0
-            width_by_row = (total_width - gap * (count - 1)) / count
-            width_by_height = images_height * assumed_aspect
-            width_each = min(width_by_row, width_by_height, 5.0)
-            est_height = width_each / assumed_aspect
-            top0 = images_top + max(0.0, (images_height - est_height) / 2)
-            # 左边距统一为1.0，与文字区域对齐
-            start_left = 1.0
-            for i, block in enumerate(imgs):
-                path = self.renderer._resolve_image_path(block['src'])
-                left = start_left + i * (width_each + gap)
-                # 使用计算出的高度，确保不超过可用区域
-                pic_height = min(est_height, images_height)
-                # 获取图片标题
-                image_caption = block.get('caption', f"图片 {i+1}")
-                self.renderer.insert_image(idx, path, left, top0, width_each, pic_height, image_caption)
-            print(f"已添加图片 {count} 张，等宽布局")
-        except Exception as e:
-            print(f"添加图片时出错: {e}")
+        idx = self.renderer._get_slide_index(slide)
+        self._place_images(idx, image_blocks, 1.0, 11.0, images_top, images_height)
     
     def layout_table_and_images(self, slide, table_block, image_blocks, content_top, content_height):
         """布局5: 表格+图片 - 底部横排对齐"""
-        print(f"    应用布局: 表格+图片布局（底部横排对齐）")
+        log.debug("应用布局: 表格+图片布局（底部横排对齐）")
         # 在内容区域底部创建一个横向分区，将表格与图片并排放置，并整体居中
         band_margin_h = 0.0
         band_left = 1.0
@@ -290,77 +183,15 @@ class LayoutManager:
         right_col_left = band_left + col_width + gap
         # 表格区域：左列，直接调用 insert_table 顶部对齐
         idx = self.renderer._get_slide_index(slide)
-        try:
-            lines = table_block.get('lines', []) if table_block else []
-            header_line = lines[0].strip() if len(lines) > 0 else ''
-            data_lines = lines[2:] if len(lines) > 2 else []
-            header_cells = [cell.strip() for cell in header_line.split('|') if cell.strip()] or ['']
-            cols = len(header_cells)
-            rows = 1 + len(data_lines)
-            # 限制规模，保证适配区域
-            max_cols = min(cols, 5)
-            max_rows = min(rows, 8)
-            # 组装数据
-            data = []
-            data.append(header_cells[:max_cols] + [''] * (max_cols - len(header_cells[:max_cols])))
-            for line in data_lines[:max_rows-1]:
-                cells = [c.strip() for c in line.split('|') if c.strip()]
-                row = cells[:max_cols] + [''] * (max_cols - len(cells[:max_cols]))
-                data.append(row)
-            # 获取表格标题
-            table_caption = table_block.get('caption', f"表格 1")
-            self.renderer.insert_table(
-                slide_index=idx,
-                rows=max_rows,
-                cols=max_cols,
-                data=data,
-                left=left_col_left,
-                top=band_top,
-                width=col_width,
-                height=band_height,
-                caption=table_caption
-            )
-        except Exception as e:
-            print(f"直接插入表格失败: {e}")
+        self._insert_table_block(idx, table_block, band_top, band_height,
+                                 width_override=col_width, left_override=left_col_left)
 
         # 图片区域：右列，直接调用 insert_image 顶部对齐，等宽布局
-        try:
-            max_images = 3
-            imgs = (image_blocks or [])[:max_images]
-            count = len(imgs)
-            if count > 0:
-                gap = 0.3
-                if count == 1:
-                    assumed_aspect = 16.0 / 9.0
-                    width_each = min(col_width * 0.9, band_height * assumed_aspect, 8.0)
-                    left_offset = (col_width - width_each) / 2
-                    path = self.renderer._resolve_image_path(imgs[0]['src'])
-                    # 直接使用区域高度，与表格保持一致
-                    pic_height = band_height
-                    # 获取图片标题
-                    image_caption = imgs[0].get('caption', f"图片 1")
-                    self.renderer.insert_image(idx, path, right_col_left + left_offset, band_top, width_each, pic_height, image_caption)
-                else:
-                    assumed_aspect = 4.0 / 3.0
-                    width_by_row = (col_width - gap * (count - 1)) / count
-                    width_by_height = band_height * assumed_aspect
-                    width_each = min(width_by_row, width_by_height, 4.5)
-                    total_group_width = width_each * count + gap * (count - 1)
-                    start_offset = (col_width - total_group_width) / 2
-                    for i, block in enumerate(imgs):
-                        path = self.renderer._resolve_image_path(block['src'])
-                        left = right_col_left + start_offset + i * (width_each + gap)
-                        # 直接使用区域高度，与表格保持一致
-                        pic_height = band_height
-                        # 获取图片标题
-                        image_caption = block.get('caption', f"图片 {i+1}")
-                        self.renderer.insert_image(idx, path, left, band_top, width_each, pic_height, image_caption)
-        except Exception as e:
-            print(f"直接插入图片失败: {e}")
+        self._place_images_in_column(idx, image_blocks, right_col_left, col_width, band_top, band_height)
     
     def layout_text_table_images(self, slide, text_blocks, table_block, image_blocks, content_top, content_height):
         """布局6: 文字+表格+图片 - 上文字、左表格、右图片"""
-        print(f"    应用布局: 文字+表格+图片布局（上文字、左表格、右图片）")
+        log.debug("应用布局: 文字+表格+图片布局（上文字、左表格、右图片）")
         
         # 1) 顶部文字：根据内容动态估算高度，设定最小/最大边界
         max_text_ratio = 0.35
@@ -374,80 +205,20 @@ class LayoutManager:
         
         remaining_top = content_top + (text_height if text_blocks else 0)
         remaining_height = max(0.0, content_height - (text_height if text_blocks else 0))
+        idx = self.renderer._get_slide_index(slide)
         if remaining_height <= 0.4:
+            # 剩余空间不足以分栏：表格与图片直接放在剩余区域
             if table_block:
-                # 高度已由区域限制，此处直接使用
-                # 使用insert_table替代_add_table_grid
-                idx = self.renderer._get_slide_index(slide)
-                # 获取表格标题
-                table_caption = table_block.get('caption', f"表格 1")
-                # 计算表格居中位置
-                slide_width = 13.33
-                table_width = min(10.0, 5 * 2.0)  # 假设最多5列
-                table_left = (slide_width - table_width) / 2
-                self.renderer.insert_table(
-                    slide_index=idx,
-                    rows=4,  # 假设4行
-                    cols=3,  # 假设3列
-                    data=None,
-                    left=table_left,
-                    top=remaining_top,
-                    width=table_width,
-                    height=remaining_height,
-                    caption=table_caption
-                )
+                self._insert_table_block(idx, table_block, remaining_top, remaining_height)
             if image_blocks:
-                # 直接使用insert_image插入图片，确保高度不超过可用区域
-                try:
-                    max_images = 3
-                    imgs = (image_blocks or [])[:max_images]
-                    count = len(imgs)
-                    if count > 0:
-                        total_width = 11.0
-                        gap = 0.3
-                        idx = self.renderer._get_slide_index(slide)
-                        
-                        if count == 1:
-                            # 单张图片：高度优先，假设16:9比例
-                            assumed_aspect = 16.0 / 9.0
-                            width_each = min(total_width, remaining_height * assumed_aspect, 10.0)
-                            left0 = (13.33 - width_each) / 2
-                            # 垂直居中到可用区域
-                            est_height = width_each / assumed_aspect
-                            top0 = remaining_top + max(0.0, (remaining_height - est_height) / 2)
-                            path = self.renderer._resolve_image_path(imgs[0]['src'])
-                            # 使用计算出的高度，确保不超过可用区域
-                            pic_height = min(est_height, remaining_height)
-                            # 获取图片标题
-                            image_caption = imgs[0].get('caption', f"图片 1")
-                            self.renderer.insert_image(idx, path, left0, top0, width_each, pic_height, image_caption)
-                        else:
-                            # 多张图片：等宽排列
-                            assumed_aspect = 4.0 / 3.0
-                            width_by_row = (total_width - gap * (count - 1)) / count
-                            width_by_height = remaining_height * assumed_aspect
-                            width_each = min(width_by_row, width_by_height, 5.0)
-                            est_height = width_each / assumed_aspect
-                            top0 = remaining_top + max(0.0, (remaining_height - est_height) / 2)
-                            # 左边距统一为1.0，与文字区域对齐
-                            start_left = 1.0
-                            for i, block in enumerate(imgs):
-                                path = self.renderer._resolve_image_path(block['src'])
-                                left = start_left + i * (width_each + gap)
-                                # 使用计算出的高度，确保不超过可用区域
-                                pic_height = min(est_height, remaining_height)
-                                # 获取图片标题
-                                image_caption = block.get('caption', f"图片 {i+1}")
-                                self.renderer.insert_image(idx, path, left, top0, width_each, pic_height, image_caption)
-                except Exception as e:
-                    print(f"添加图片时出错: {e}")
+                self._place_images(idx, image_blocks, 1.0, 11.0, remaining_top, remaining_height)
             return
         
         # 2) 剩余区域左右分栏：左表格、右图片
         left_margin = 0.8
         right_margin = 0.8
         middle_gap = 0.4
-        slide_width_in = 13.33
+        slide_width_in = self._SLIDE_W
         available_width = slide_width_in - left_margin - right_margin
         left_region_width = (available_width - middle_gap) / 2
         right_region_width = (available_width - middle_gap) / 2
@@ -459,77 +230,15 @@ class LayoutManager:
         region_height = max(0.5, remaining_height - 0.1)
         
         # 表格：在左侧区域内直接插入表格
-        idx = self.renderer._get_slide_index(slide)
-        try:
-            lines = table_block.get('lines', []) if table_block else []
-            header_line = lines[0].strip() if len(lines) > 0 else ''
-            data_lines = lines[2:] if len(lines) > 2 else []
-            header_cells = [cell.strip() for cell in header_line.split('|') if cell.strip()] or ['']
-            cols = len(header_cells)
-            rows = 1 + len(data_lines)
-            max_cols = min(cols, 5)
-            max_rows = min(rows, 8)
-            data = []
-            data.append(header_cells[:max_cols] + [''] * (max_cols - len(header_cells[:max_cols])))
-            for line in data_lines[:max_rows-1]:
-                cells = [c.strip() for c in line.split('|') if c.strip()]
-                row = cells[:max_cols] + [''] * (max_cols - len(cells[:max_cols]))
-                data.append(row)
-            # 获取表格标题
-            table_caption = table_block.get('caption', f"表格 1")
-            self.renderer.insert_table(
-                slide_index=idx,
-                rows=max_rows,
-                cols=max_cols,
-                data=data,
-                left=table_left,
-                top=region_top,
-                width=left_region_width,
-                height=region_height,
-                caption=table_caption
-            )
-        except Exception as e:
-            print(f"直接插入表格失败: {e}")
+        self._insert_table_block(idx, table_block, region_top, region_height,
+                                 width_override=left_region_width, left_override=table_left)
 
         # 图片：在右侧区域内直接插入图片，顶部对齐
-        try:
-            max_images = 3
-            imgs = (image_blocks or [])[:max_images]
-            count = len(imgs)
-            if count > 0:
-                gap = 0.3
-                if count == 1:
-                    assumed_aspect = 16.0 / 9.0
-                    width_each = min(right_region_width * 0.9, region_height * assumed_aspect, 8.0)
-                    left_offset = (right_region_width - width_each) / 2
-                    path = self.renderer._resolve_image_path(imgs[0]['src'])
-                    # 计算图片高度，使其与表格高度一致
-                    pic_height = region_height
-                    # 获取图片标题
-                    image_caption = imgs[0].get('caption', f"图片 1")
-                    self.renderer.insert_image(idx, path, images_left + left_offset, region_top, width_each, pic_height, image_caption)
-                else:
-                    assumed_aspect = 4.0 / 3.0
-                    width_by_row = (right_region_width - gap * (count - 1)) / count
-                    width_by_height = region_height * assumed_aspect
-                    width_each = min(width_by_row, width_by_height, 4.5)
-                    total_group_width = width_each * count + gap * (count - 1)
-                    start_offset = (right_region_width - total_group_width) / 2
-                    top_offset = 0.0  # 顶部对齐
-                    for i, block in enumerate(imgs):
-                        path = self.renderer._resolve_image_path(block['src'])
-                        left = images_left + start_offset + i * (width_each + gap)
-                        # 计算图片高度，使其与表格高度一致
-                        pic_height = region_height
-                        # 获取图片标题
-                        image_caption = block.get('caption', f"图片 {i+1}")
-                        self.renderer.insert_image(idx, path, left, region_top, width_each, pic_height, image_caption)
-        except Exception as e:
-            print(f"直接插入图片失败: {e}")
+        self._place_images_in_column(idx, image_blocks, images_left, right_region_width, region_top, region_height)
     
     def layout_complex_content(self, slide, text_blocks, table_blocks, content_top, content_height):
         """布局7: 复杂内容 - 紧凑布局"""
-        print(f"    应用布局: 复杂内容布局")
+        log.debug("应用布局: 复杂内容布局")
         
         current_top = content_top
         remaining_height = content_height
@@ -544,49 +253,212 @@ class LayoutManager:
         # 多个表格垂直排列
         if table_blocks and remaining_height > 0.5:
             table_height = remaining_height / len(table_blocks)
+            idx = self.renderer._get_slide_index(slide)
             for i, table_block in enumerate(table_blocks):
                 if remaining_height > 0.3:
                     actual_table_height = min(table_height, remaining_height)
-                    # 使用insert_table替代_add_table_grid
-                    idx = self.renderer._get_slide_index(slide)
-                    # 获取表格标题
-                    table_caption = table_block.get('caption', f"表格 {i+1}")
-                    # 计算表格居中位置
-                    slide_width = 13.33
-                    table_width = min(10.0, 5 * 2.0)  # 假设最多5列
-                    table_left = (slide_width - table_width) / 2
-                    self.renderer.insert_table(
-                        slide_index=idx,
-                        rows=4,  # 假设4行
-                        cols=3,  # 假设3列
-                        data=None,
-                        left=table_left,
-                        top=current_top,
-                        width=table_width,
-                        height=actual_table_height,
-                        caption=table_caption
-                    )
+                    self._insert_table_block(idx, table_block, current_top, actual_table_height, caption_idx=i + 1)
                     current_top += actual_table_height
                     remaining_height -= actual_table_height
     
+    def _table_box(self, content_top, content_height, rows, height_ratio, top_ratio=None):
+        """
+        计算表格的 (top, height)：高度根据行数自适应，不超过内容区 height_ratio；
+        top_ratio 为空时在内容区垂直居中，否则位于内容区 top_ratio 处
+        """
+        key = (content_top, content_height, rows, height_ratio, top_ratio)
+        box = self._geom_cache.get(key)
+        if box is None:
+            base_row_h = max(0.4, min(0.7, 0.6 - 0.02 * max(0, rows - 4)))
+            required_h = base_row_h * min(rows, 6) + 0.2
+            table_height = max(0.8, min(content_height * height_ratio, required_h))
+            if top_ratio is None:
+                table_top = content_top + max(0.0, (content_height - table_height) / 2)
+            else:
+                table_top = content_top + content_height * top_ratio
+            box = self._geom_cache[key] = (table_top, table_height)
+        return box
+    
+    def _insert_table_block(self, idx, table_block, top, height, width_override=None,
+                            left_override=None, caption_idx=1):
+        """插入表格块：最多5列8行，默认宽度按列数估算并在页面水平居中"""
+        try:
+            cols, rows = self._ensure_table_geometry(table_block)
+            # 限制规模，保证适配区域
+            max_cols = min(cols, _TABLE_MAX_COLS)
+            max_rows = min(rows, _TABLE_MAX_ROWS)
+            data = table_block['_data_grid']
+            
+            table_width = width_override or min(10.0, max_cols * 2.0)
+            table_left = left_override if left_override is not None else (self._SLIDE_W - table_width) / 2
+            # 获取表格标题
+            table_caption = table_block.get('caption') or f"表格 {caption_idx}"
+            return self.renderer.insert_table(
+                slide_index=idx,
+                rows=max_rows,
+                cols=max_cols,
+                data=data,
+                left=table_left,
+                top=top,
+                width=table_width,
+                height=height,
+                caption=table_caption
+            )
+        except Exception:
+            log.exception("直接插入表格失败")
+            return None
+    
+    def _ensure_table_geometry(self, table_block):
+        """解析表格块的行列与单元格（每个表格块只解析一次，结果缓存在块上），返回 (cols, rows)"""
+        if '_cols' in table_block:
+            return table_block['_cols'], table_block['_rows']
+        # 解析器生成 lines；兼容以 text 形式给出的表格
+        lines = table_block.get('lines')
+        if not lines:
+            text = table_block.get('text')
+            lines = text.splitlines() if text else ()
+        lines = [ln.strip() for ln in lines if ln and ln.strip()]
+        if not lines:
+            # 空表格：按默认 3 列 4 行占位
+            header_cells, data_rows = [''], []
+            cols, rows = 3, 4
+        else:
+            # 第二行为分隔行 |---|，数据从第三行开始
+            # 先用 isspace 过滤空单元格，只对保留的单元格做一次 strip
+            header_cells = [c.strip() for c in lines[0].split('|') if c and not c.isspace()] or ['']
+            data_rows = [[c.strip() for c in line.split('|') if c and not c.isspace()] for line in lines[2:]]
+            cols = len(header_cells)
+            rows = 1 + len(data_rows)
+        # 插入用的数据网格：限制规模（最多5列8行），不足补空
+        max_cols = min(cols, _TABLE_MAX_COLS)
+        max_rows = min(rows, _TABLE_MAX_ROWS)
+        data_grid = [header_cells[:max_cols] + [''] * (max_cols - len(header_cells[:max_cols]))]
+        for cells in data_rows[:max_rows-1]:
+            data_grid.append(cells[:max_cols] + [''] * (max_cols - len(cells[:max_cols])))
+        table_block['_cols'] = cols
+        table_block['_rows'] = rows
+        table_block['_header_cells'] = header_cells
+        table_block['_data_rows'] = data_rows
+        table_block['_data_grid'] = data_grid
+        return cols, rows
+    
+    def _place_images(self, idx, image_blocks, area_left, area_width, area_top, area_height):
+        """在区域内放置图片（最多3张）：单张水平居中于页面，多张从区域左侧等宽排列，均垂直居中"""
+        try:
+            src = image_blocks or ()
+            count = min(len(src), _MAX_IMAGES)
+            if count == 0:
+                return
+            
+            gap = _IMG_GAP
+            resolve = self.renderer._resolve_image_path
+            insert_image = self.renderer.insert_image
+            
+            # 相同区域尺寸在一份文档中反复出现，计算结果走缓存
+            width_each, est_height = _image_grid(count, round(area_width * 1000), round(area_height * 1000))
+            
+            if count == 1:
+                # 单张图片：水平居中于页面
+                left0 = (self._SLIDE_W - width_each) / 2
+                # 垂直居中到可用区域
+                top0 = area_top + max(0.0, (area_height - est_height) / 2)
+                path = resolve(src[0]['src'])
+                # 使用计算出的高度，确保不超过可用区域
+                pic_height = min(est_height, area_height)
+                # 获取图片标题
+                image_caption = src[0].get('caption', f"图片 1")
+                insert_image(idx, path, left0, top0, width_each, pic_height, image_caption)
+                return
+            
+            # 多张图片：等宽排列
+            top0 = area_top + max(0.0, (area_height - est_height) / 2)
+            stride = width_each + gap
+            # 使用计算出的高度，确保不超过可用区域
+            pic_height = min(est_height, area_height)
+            for i, block in enumerate(islice(src, count)):
+                path = resolve(block['src'])
+                # 左边距与文字区域对齐
+                left = area_left + i * stride
+                # 获取图片标题
+                image_caption = block.get('caption', f"图片 {i+1}")
+                insert_image(idx, path, left, top0, width_each, pic_height, image_caption)
+            log.debug("已添加图片 %d 张，等宽布局", count)
+        except Exception:
+            log.exception("添加图片时出错")
+    
+    def _place_images_in_column(self, idx, image_blocks, col_left, col_width, col_top, col_height):
+        """在分栏内放置图片（最多3张）：水平居中、顶部对齐，高度与分栏一致"""
+        try:
+            src = image_blocks or ()
+            count = min(len(src), _MAX_IMAGES)
+            if count == 0:
+                return
+            
+            gap = _IMG_GAP
+            resolve = self.renderer._resolve_image_path
+            insert_image = self.renderer.insert_image
+            
+            if count == 1:
+                assumed_aspect = _ASPECT_SINGLE
+                width_each = min(col_width * 0.9, col_height * assumed_aspect, 8.0)
+                left_offset = (col_width - width_each) / 2
+                path = resolve(src[0]['src'])
+                # 获取图片标题
+                image_caption = src[0].get('caption', f"图片 1")
+                insert_image(idx, path, col_left + left_offset, col_top, width_each, col_height, image_caption)
+                return
+            
+            assumed_aspect = _ASPECT_MULTI
+            width_by_row = (col_width - gap * (count - 1)) / count
+            width_by_height = col_height * assumed_aspect
+            width_each = min(width_by_row, width_by_height, 4.5)
+            total_group_width = width_each * count + gap * (count - 1)
+            start_left = col_left + (col_width - total_group_width) / 2
+            stride = width_each + gap
+            for i, block in enumerate(islice(src, count)):
+                path = resolve(block['src'])
+                left = start_left + i * stride
+                # 获取图片标题
+                image_caption = block.get('caption', f"图片 {i+1}")
+                insert_image(idx, path, left, col_top, width_each, col_height, image_caption)
+        except Exception:
+            log.exception("直接插入图片失败")
+    
+    def _get_text_cfg(self):
+        """获取文本估算参数（从FontCalculator读取一次后缓存）"""
+        cfg = self._text_cfg
+        if cfg is None:
+            text_config = self.font_calc.get_text_estimation_config()
+            font_size_pt = self.font_calc.base_sizes.get('text', 18)  # 使用配置的正文字号
+            cfg = (
+                font_size_pt,
+                (font_size_pt * text_config.get('line_height_ratio', 1.2)) / 72.0,
+                text_config.get('gap_list', 6) / 72.0,
+                text_config.get('gap_paragraph', 8) / 72.0,
+                text_config.get('min_chars_per_line', 8),
+            )
+            self._text_cfg = cfg
+        return cfg
+    
     def estimate_text_block_height(self, text_blocks, container_width_in, available_height_in) -> float:
         """更精确估算文本高度（英寸）"""
         try:
             if not text_blocks:
                 return 0.0
 
-            # 从FontCalculator获取文本估算配置
-            text_config = self.font_calc.get_text_estimation_config()
-            font_size_pt = self.font_calc.base_sizes.get('text', 18)  # 使用配置的正文字号
-            line_height_in = (font_size_pt * text_config.get('line_height_ratio', 1.2)) / 72.0
-            gap_list_in = text_config.get('gap_list', 6) / 72.0
-            gap_para_in = text_config.get('gap_paragraph', 8) / 72.0
+            font_size_pt, line_height_in, gap_list_in, gap_para_in, min_chars = self._get_text_cfg()
 
             # 每行可容纳字符数（CJK 近似方宽：字符宽≈字号pt/72 英寸）
-            def chars_per_line_for(width_in: float) -> int:
-                min_chars = text_config.get('min_chars_per_line', 8)
-                cpp = int(max(min_chars, (width_in * 72.0) / max(8.0, float(font_size_pt))))
-                return cpp
+            char_pt = max(8.0, float(font_size_pt))
+            
+            # 快速路径：单个短段落（最常见的情况）只占一行，无需逐块估算
+            if len(text_blocks) == 1 and text_blocks[0].get('type') == 'paragraph':
+                text = str(text_blocks[0].get('text', '') or '')
+                if text.strip() == '':
+                    return 0.0
+                if len(text) <= int(max(min_chars, (container_width_in * 72.0) / char_pt)):
+                    total_height_in = line_height_in + gap_para_in - min(gap_para_in, gap_list_in)
+                    return max(0.0, min(total_height_in, max(0.0, available_height_in)))
 
             total_height_in = 0.0
             block_count_for_gaps = 0
@@ -598,21 +470,21 @@ class LayoutManager:
                         continue
                     # 列表有效宽度：考虑项目符号与缩进
                     effective_width_in = max(1.0, container_width_in - 0.3)
-                    cpp = chars_per_line_for(effective_width_in)
+                    cpp = int(max(min_chars, (effective_width_in * 72.0) / char_pt))
+                    # 每项至少一行，-(-n // cpp) 即向上取整
+                    total_lines = 0
                     for item in items:
-                        text = str(item or '')
-                        char_len = len(text)
-                        lines = max(1, (char_len + cpp - 1) // cpp)
-                        total_height_in += lines * line_height_in
-                        # 段后距：每个列表项后添加
-                        total_height_in += gap_list_in
-                        block_count_for_gaps += 1
+                        total_lines += -(-len(item) // cpp) if item else 1
+                    # 段后距：每个列表项后添加
+                    n = len(items)
+                    total_height_in += total_lines * line_height_in + n * gap_list_in
+                    block_count_for_gaps += n
                 elif block.get('type') == 'paragraph':
                     text = str(block.get('text', '') or '')
                     if text.strip() == '':
                         continue
                     effective_width_in = container_width_in
-                    cpp = chars_per_line_for(effective_width_in)
+                    cpp = int(max(min_chars, (effective_width_in * 72.0) / char_pt))
                     char_len = len(text)
                     lines = max(1, (char_len + cpp - 1) // cpp)
                     total_height_in += lines * line_height_in
@@ -7,14 +7,130 @@ PPTX日志管理器
 根据配置文件控制PPTX生成过程中的日志输出
 """
 
+import atexit
+import hashlib
+import io
+import json
 import os
-import yaml
+import sys
+import threading
+import weakref
+from functools import cache, lru_cache
 from typing import Dict, Any, Optional
 from datetime import datetime
 
 
+# 日志级别与输出控制项，加载配置时展开为实例属性 _lv_<级别> / _<输出控制项>
+_LOG_LEVEL_KEYS = (
+    'component_init', 'font_calculation', 'layout_management', 'content_rendering',
+    'slide_building', 'file_operations', 'debug_details', 'performance_stats',
+)
+_OUTPUT_CONTROL_KEYS = (
+    'show_progress', 'show_content_analysis', 'show_layout_decisions', 'show_font_calculations',
+    'show_image_processing', 'show_table_processing', 'show_slide_creation', 'show_chapter_processing',
+)
+
+# 各日志方法对应的 (日志级别, 输出控制项)；两者任一关闭时该方法在实例上绑定为空操作
+_METHOD_GATES = {
+    'log_component_init': ('component_init', None),
+    'log_font_calculation': ('font_calculation', 'show_font_calculations'),
+    'log_layout_management': ('layout_management', 'show_layout_decisions'),
+    'log_content_rendering': ('content_rendering', None),
+    'log_slide_building': ('slide_building', None),
+    'log_file_operations': ('file_operations', None),
+    'log_performance': ('performance_stats', None),
+    'log_debug': ('debug_details', None),
+    'log_progress': ('general', 'show_progress'),
+    'log_content_analysis': ('general', 'show_content_analysis'),
+    'log_image_processing': ('content_rendering', 'show_image_processing'),
+    'log_table_processing': ('content_rendering', 'show_table_processing'),
+    'log_success': ('general', None),
+    'log_warning': ('general', None),
+    'log_error': ('general', None),
+    'log_info': ('general', None),
+    'log_slide_creation': ('slide_building', 'show_slide_creation'),
+    'log_chapter_processing': ('slide_building', 'show_chapter_processing'),
+}
+
+
+def _config_cache_path(path: str, mtime_ns: int, size: int) -> str:
+    """YAML 解析结果的 JSON 缓存文件：位于用户缓存目录，文件名含路径摘要、修改时间与大小"""
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    key = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, 'ai_office', f'pptx_log_config-{key}-{mtime_ns}-{size}.json')
+
+
+@lru_cache(maxsize=8)
+def _load_pptx_log_config(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """
+    解析日志配置文件，按 (路径, 修改时间, 大小) 缓存，多个实例共享同一份结果（只读）
+    
+    YAML 解析较慢，解析结果以 JSON 写入用户缓存目录，之后的进程直接读取；
+    缓存文件名含配置的修改时间与大小，配置变化后自然失效，不写入安装目录
+    """
+    cache_path = _config_cache_path(path, mtime_ns, size)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    
+    import yaml
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    
+    # 先写临时文件再替换，并发进程不会读到半个文件；缓存目录不可写或配置不可序列化时忽略
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError, ValueError):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return config
+
+
+# 各日志方法的默认组件名，加载配置时预先生成对应前缀
+_DEFAULT_COMPONENTS = (
+    '', 'FontCalculator', 'LayoutManager', 'ContentRenderer', 'SlideBuilder',
+    'FileOps', 'Performance', 'Debug', 'ChapterProcessor',
+)
+
+# 日志先写入内存缓冲，超过该大小时写出一次（from_md/save 结束时也会显式 flush）
+_FLUSH_THRESHOLD = 64 * 1024
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+# 进程退出前写出所有日志实例缓冲中剩余的日志（只注册一个退出钩子，不延长实例生命周期）
+_LOGGERS = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    for logger in list(_LOGGERS):
+        logger.flush()
+
+
 class PPTXLogger:
-    """PPTX日志管理器"""
+    """
+    PPTX日志管理器
+    
+    log_* 在实例上以槽位保存：启用的类别指向对应的 _log_* 实现，关闭的类别指向空操作。
+    """
+    
+    __slots__ = (
+        '__weakref__', 'config_path', 'config', '_buf', '_lock', '_levels', '_output_control', '_prefixes',
+        '_fmt_prefix', '_fmt_include_ts', '_fmt_ts_format', '_fmt_include_component',
+    ) + tuple('_lv_' + key for key in _LOG_LEVEL_KEYS) \
+      + tuple('_' + key for key in _OUTPUT_CONTROL_KEYS) \
+      + tuple(_METHOD_GATES)
     
     def __init__(self, config_path: Optional[str] = None):
         """
@@ -30,16 +146,52 @@ class PPTXLogger:
         
         self.config_path = config_path
         self.config = self._load_config()
+        self._buf = io.StringIO()
+        # 缓冲由多个线程共用（服务中构建与上传并发进行），写入与写出都在锁内完成
+        self._lock = threading.Lock()
+        self._apply_config()
+        _LOGGERS.add(self)
+    
+    def _apply_config(self):
+        """将配置展开为实例属性，日志调用时无需再逐级查字典"""
+        levels = self.config.get('log_levels') or {}
+        output_control = self.config.get('output_control') or {}
+        log_format = self.config.get('log_format') or {}
+        
+        self._levels = levels
+        for key in _LOG_LEVEL_KEYS:
+            setattr(self, '_lv_' + key, bool(levels.get(key, True)))
+        self._output_control = output_control
+        for key in _OUTPUT_CONTROL_KEYS:
+            setattr(self, '_' + key, bool(output_control.get(key, True)))
+        
+        self._fmt_prefix = log_format.get('prefix', '📊')
+        self._fmt_include_ts = bool(log_format.get('include_timestamp', False))
+        self._fmt_ts_format = log_format.get('timestamp_format', "%Y-%m-%d %H:%M:%S")
+        self._fmt_include_component = bool(log_format.get('include_component_name', False))
+        
+        # 不带时间戳时前缀只取决于组件名，按组件缓存；带时间戳时每次重新生成
+        if self._fmt_include_ts:
+            self._prefixes = None
+        else:
+            self._prefixes = {name: self._get_log_prefix(name) for name in _DEFAULT_COMPONENTS}
+        
+        # 关闭的日志类别直接绑定为空操作，调用方无需再经过判断与字符串格式化
+        for method, (log_type, show_type) in _METHOD_GATES.items():
+            if self._should_log(log_type) and (show_type is None or self._should_show(show_type)):
+                setattr(self, method, getattr(self, '_' + method))
+            else:
+                setattr(self, method, _noop)
         
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    return yaml.safe_load(f) or {}
-            else:
-                print(f"⚠️  日志配置文件不存在: {self.config_path}")
-                return self._get_default_config()
+            path = os.path.abspath(self.config_path)
+            st = os.stat(path)
+            return _load_pptx_log_config(path, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            print(f"⚠️  日志配置文件不存在: {self.config_path}")
+            return self._get_default_config()
         except Exception as e:
             print(f"⚠️  加载日志配置失败: {e}")
             return self._get_default_config()
@@ -76,133 +228,154 @@ class PPTXLogger:
     
     def _get_log_prefix(self, component_name: str = "") -> str:
         """获取日志前缀"""
-        prefix = self.config.get('log_format', {}).get('prefix', '📊')
+        prefix = self._fmt_prefix
         
-        if self.config.get('log_format', {}).get('include_timestamp', False):
-            timestamp = datetime.now().strftime(
-                self.config.get('log_format', {}).get('timestamp_format', "%Y-%m-%d %H:%M:%S")
-            )
+        if self._fmt_include_ts:
+            timestamp = datetime.now().strftime(self._fmt_ts_format)
             prefix = f"[{timestamp}] {prefix}"
         
-        if self.config.get('log_format', {}).get('include_component_name', False) and component_name:
+        if self._fmt_include_component and component_name:
             prefix = f"{prefix} [{component_name}]"
         
         return prefix
     
     def _should_log(self, log_type: str) -> bool:
         """检查是否应该输出指定类型的日志"""
-        return self.config.get('log_levels', {}).get(log_type, True)
+        return self._levels.get(log_type, True)
     
     def _should_show(self, show_type: str) -> bool:
         """检查是否应该显示指定类型的信息"""
-        return self.config.get('output_control', {}).get(show_type, True)
+        return self._output_control.get(show_type, True)
     
     def log(self, message: str, log_type: str = "general", component_name: str = ""):
         """输出日志"""
         if not self._should_log(log_type):
             return
         
-        prefix = self._get_log_prefix(component_name)
-        print(f"{prefix} {message}")
+        self._emit('', message, component_name)
+    
+    def _emit(self, icon: str, message: str, component_name: str = ""):
+        """输出一行日志（不再检查开关），各段直接写入缓冲，不再拼接中间字符串"""
+        prefixes = self._prefixes
+        if prefixes is None:
+            prefix = self._get_log_prefix(component_name)
+        else:
+            prefix = prefixes.get(component_name)
+            if prefix is None:
+                prefix = prefixes[component_name] = self._get_log_prefix(component_name)
+        with self._lock:
+            buf = self._buf
+            buf.writelines((prefix, ' ', icon, message if type(message) is str else str(message), '\n'))
+            if buf.tell() >= _FLUSH_THRESHOLD:
+                self._flush_locked()
+    
+    def echo(self, message: str):
+        """原样输出一行文本（不加前缀、不受开关控制），与日志共用缓冲保证先后顺序"""
+        with self._lock:
+            buf = self._buf
+            buf.writelines((message if type(message) is str else str(message), '\n'))
+            if buf.tell() >= _FLUSH_THRESHOLD:
+                self._flush_locked()
+    
+    def flush(self):
+        """将缓冲中的日志一次写出到标准输出"""
+        with self._lock:
+            self._flush_locked()
     
-    def log_component_init(self, component_name: str, message: str):
+    def _flush_locked(self):
+        """写出并清空缓冲（调用方已持有锁）"""
+        buf = self._buf
+        if buf.tell():
+            sys.stdout.write(buf.getvalue())
+            sys.stdout.flush()
+            buf.seek(0)
+            buf.truncate()
+    
+    def _log_component_init(self, component_name: str, message: str):
         """组件初始化日志"""
-        if self._should_log("component_init"):
-            self.log(f"✅ {component_name}: {message}", "component_init", component_name)
+        self._emit("✅ ", f"{component_name}: {message}", component_name)
     
-    def log_font_calculation(self, message: str, component_name: str = "FontCalculator"):
+    def _log_font_calculation(self, message: str, component_name: str = "FontCalculator"):
         """字体计算日志"""
-        if self._should_log("font_calculation") and self._should_show("show_font_calculations"):
-            self.log(f"🔤 {message}", "font_calculation", component_name)
+        self._emit("🔤 ", message, component_name)
     
-    def log_layout_management(self, message: str, component_name: str = "LayoutManager"):
+    def _log_layout_management(self, message: str, component_name: str = "LayoutManager"):
         """布局管理日志"""
-        if self._should_log("layout_management") and self._should_show("show_layout_decisions"):
-            self.log(f"📐 {message}", "layout_management", component_name)
+        self._emit("📐 ", message, component_name)
     
-    def log_content_rendering(self, message: str, component_name: str = "ContentRenderer"):
+    def _log_content_rendering(self, message: str, component_name: str = "ContentRenderer"):
         """内容渲染日志"""
-        if self._should_log("content_rendering"):
-            self.log(f"🎨 {message}", "content_rendering", component_name)
+        self._emit("🎨 ", message, component_name)
     
-    def log_slide_building(self, message: str, component_name: str = "SlideBuilder"):
+    def _log_slide_building(self, message: str, component_name: str = "SlideBuilder"):
         """幻灯片构建日志"""
-        if self._should_log("slide_building"):
-            self.log(f"🏗️  {message}", "slide_building", component_name)
+        self._emit("🏗️  ", message, component_name)
     
-    def log_file_operations(self, message: str, component_name: str = "FileOps"):
+    def _log_file_operations(self, message: str, component_name: str = "FileOps"):
         """文件操作日志"""
-        if self._should_log("file_operations"):
-            self.log(f"📁 {message}", "file_operations", component_name)
+        self._emit("📁 ", message, component_name)
     
-    def log_performance(self, message: str, component_name: str = "Performance"):
+    def _log_performance(self, message: str, component_name: str = "Performance"):
         """性能统计日志"""
-        if self._should_log("performance_stats"):
-            self.log(f"⏱️  {message}", "performance_stats", component_name)
+        self._emit("⏱️  ", message, component_name)
     
-    def log_debug(self, message: str, component_name: str = "Debug"):
+    def _log_debug(self, message: str, component_name: str = "Debug"):
         """调试日志"""
-        if self._should_log("debug_details"):
-            self.log(f"🔍 {message}", "debug_details", component_name)
+        self._emit("🔍 ", message, component_name)
     
-    def log_progress(self, message: str):
+    def _log_progress(self, message: str):
         """进度日志"""
-        if self._should_show("show_progress"):
-            self.log(f"🔄 {message}", "general")
+        self._emit("🔄 ", message)
     
-    def log_content_analysis(self, message: str):
+    def _log_content_analysis(self, message: str):
         """内容分析日志"""
-        if self._should_show("show_content_analysis"):
-            self.log(f"📊 {message}", "general")
+        self._emit("📊 ", message)
     
-    def log_image_processing(self, message: str):
+    def _log_image_processing(self, message: str):
         """图片处理日志"""
-        if self._should_show("show_image_processing"):
-            self.log(f"🖼️  {message}", "content_rendering")
+        self._emit("🖼️  ", message)
     
-    def log_table_processing(self, message: str):
+    def _log_table_processing(self, message: str):
         """表格处理日志"""
-        if self._should_show("show_table_processing"):
-            self.log(f"📋 {message}", "content_rendering")
+        self._emit("📋 ", message)
     
-    def log_success(self, message: str, component_name: str = ""):
+    def _log_success(self, message: str, component_name: str = ""):
         """成功日志"""
-        self.log(f"✅ {message}", "general", component_name)
+        self._emit("✅ ", message, component_name)
     
-    def log_warning(self, message: str, component_name: str = ""):
+    def _log_warning(self, message: str, component_name: str = ""):
         """警告日志"""
-        self.log(f"⚠️  {message}", "general", component_name)
+        self._emit("⚠️  ", message, component_name)
     
-    def log_error(self, message: str, component_name: str = ""):
+    def _log_error(self, message: str, component_name: str = ""):
         """错误日志"""
-        self.log(f"❌ {message}", "general", component_name)
+        self._emit("❌ ", message, component_name)
     
-    def log_info(self, message: str, component_name: str = ""):
+    def _log_info(self, message: str, component_name: str = ""):
         """信息日志"""
-        self.log(f"ℹ️  {message}", "general", component_name)
+        self._emit("ℹ️  ", message, component_name)
     
-    def log_slide_creation(self, message: str, component_name: str = "SlideBuilder"):
+    def _log_slide_creation(self, message: str, component_name: str = "SlideBuilder"):
         """幻灯片创建日志"""
-        if self._should_show("show_slide_creation"):
-            self.log(f"🏗️  {message}", "slide_building", component_name)
+        self._emit("🏗️  ", message, component_name)
     
-    def log_chapter_processing(self, message: str, component_name: str = "ChapterProcessor"):
+    def _log_chapter_processing(self, message: str, component_name: str = "ChapterProcessor"):
         """章节处理日志"""
-        if self._should_show("show_chapter_processing"):
-            self.log(f"📖 {message}", "slide_building", component_name)
+        self._emit("📖 ", message, component_name)
 
 
-# 全局日志实例
+# 全局日志实例：get_logger 结果被缓存，set_logger 设置覆盖实例后清空缓存
 _global_logger = None
 
+
+@cache
 def get_logger() -> PPTXLogger:
     """获取全局日志实例"""
-    global _global_logger
-    if _global_logger is None:
-        _global_logger = PPTXLogger()
-    return _global_logger
+    return _global_logger if _global_logger is not None else PPTXLogger()
+
 
 def set_logger(logger: PPTXLogger):
     """设置全局日志实例"""
     global _global_logger
     _global_logger = logger
+    get_logger.cache_clear()
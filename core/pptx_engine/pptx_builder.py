@@ -2,12 +2,11 @@
 PPTX构建器主类 - 负责整体协调和公共接口
 """
 
+import io
 import os
-import sys
-from typing import List, Optional
-
-# 添加项目根目录到Python路径
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from importlib.util import find_spec
+from itertools import chain
+from typing import BinaryIO, Iterable, List, Optional, Union
 
 # 导入工具函数
 from utils.pptx_utils import (
@@ -17,23 +16,18 @@ from utils.pptx_utils import (
 )
 
 # 导入组件
-from .font_calculator import FontCalculator
+from .font_calculator import get_font_calculator
 from .content_renderer import ContentRenderer
 from .layout_manager import LayoutManager
 from .slide_builder import SlideBuilder
+from .logger import get_logger
 
-pptx_installed = True
-try:
-    from pptx import Presentation
-    from pptx.util import Inches, Pt
-    from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
+# Presentation 在构造 PPTXBuilder 时才导入；类常量 TITLE_COLOR 需要 RGBColor
+pptx_installed = find_spec('pptx') is not None
+if pptx_installed:
     from pptx.dml.color import RGBColor
-    from pptx.enum.shapes import MSO_SHAPE, PP_PLACEHOLDER
-    from pptx.enum.dml import MSO_THEME_COLOR
-    from pptx.oxml import parse_xml
-except ImportError:
+else:
     print("警告: 未检测到python-pptx库，功能将不可用 (pip install python-pptx)")
-    pptx_installed = False
 
 
 class PPTXBuilder:
@@ -63,31 +57,38 @@ class PPTXBuilder:
         self.file_path = file_path
         self.prs = None
         self.md_base_dir = None
+        self._layout_by_name = None  # 版式名称 -> 版式，首次 add_slide 时构建
+        self._pristine_template = None  # 由模板加载且尚未修改时记录模板路径，from_md 可直接复用
         
         # 初始化组件
         self._init_components(file_path, template_path)
     
     def _init_components(self, file_path: Optional[str], template_path: Optional[str]):
         """初始化各个组件"""
+        from pptx import Presentation
+        self._Presentation = Presentation
+        
         # 初始化Presentation
         if file_path and os.path.exists(file_path):
             self.prs = Presentation(file_path)
         elif template_path and os.path.exists(template_path):
             self.prs = Presentation(template_path)
+            self._pristine_template = os.path.abspath(template_path)
         else:
             self.prs = Presentation()
         
         # 初始化各个组件
-        self.font_calc = FontCalculator()
+        self.font_calc = get_font_calculator()
         self.renderer = ContentRenderer(self.prs, self.font_calc)
         self.layout_manager = LayoutManager(self.renderer, self.font_calc)
-        self.slide_builder = SlideBuilder(self.prs, self.renderer, self.font_calc)
+        self.slide_builder = SlideBuilder(self.prs, self.renderer, self.font_calc, self.layout_manager)
     
     def _reinit_components(self):
         """重新初始化组件，使用当前的Presentation对象"""
+        self._layout_by_name = None
         self.renderer = ContentRenderer(self.prs, self.font_calc)
         self.layout_manager = LayoutManager(self.renderer, self.font_calc)
-        self.slide_builder = SlideBuilder(self.prs, self.renderer, self.font_calc)
+        self.slide_builder = SlideBuilder(self.prs, self.renderer, self.font_calc, self.layout_manager)
     
     # 基础操作
     def save(self, output_path: Optional[str] = None) -> str:
@@ -97,34 +98,40 @@ class PPTXBuilder:
             raise ValueError("未指定保存路径")
         os.makedirs(os.path.dirname(path), exist_ok=True)
         self.prs.save(path)
+        get_logger().flush()
         return path
 
     def info(self) -> str:
         """获取PPT信息"""
-        slide_count = len(self.prs.slides)
-        lines = [f"幻灯片数量: {slide_count}", "", "幻灯片概览:"]
-        for i, slide in enumerate(self.prs.slides):
-            title = "无标题"
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text and (getattr(shape, "name", "").startswith("Title") or "标题" in getattr(shape, "name", "")):
-                    txt = shape.text
-                    title = txt[:50] + "..." if len(txt) > 50 else txt
-                    break
-            lines.append(f"幻灯片 {i+1}: {title} (形状 {len(slide.shapes)})")
+        slides = self.prs.slides
+        lines = [f"幻灯片数量: {len(slides)}", "", "幻灯片概览:"]
+        lines.extend(
+            f"幻灯片 {i}: {self._slide_title(slide)} (形状 {len(slide.shapes)})"
+            for i, slide in enumerate(slides, 1)
+        )
         return "\n".join(lines)
     
+    @staticmethod
+    def _slide_title(slide) -> str:
+        """取第一个有文本的标题形状作为页标题（截断到50字）"""
+        txt = next((text for shape in slide.shapes
+                    if (name := getattr(shape, "name", "")) and (name.startswith("Title") or "标题" in name)
+                    and (text := getattr(shape, "text", ""))), None)
+        if txt is None:
+            return "无标题"
+        return txt[:50] + "..." if len(txt) > 50 else txt
+    
     # 幻灯片操作
     def add_slide(self, layout_name: str = "Title and Content") -> int:
         """添加幻灯片"""
+        self._pristine_template = None
         try:
-            chosen_layout = None
-            for layout in self.prs.slide_layouts:
-                try:
-                    if getattr(layout, 'name', '') == layout_name:
-                        chosen_layout = layout
-                        break
-                except Exception:
-                    continue
+            if self._layout_by_name is None:
+                layouts = {}
+                for layout in self.prs.slide_layouts:
+                    layouts.setdefault(getattr(layout, 'name', ''), layout)  # 重名时保留第一个
+                self._layout_by_name = layouts
+            chosen_layout = self._layout_by_name.get(layout_name)
             if chosen_layout is None:
                 # 常用默认布局：标题和内容，一般索引为1
                 fallback_idx = 1 if len(self.prs.slide_layouts) > 1 else 0
@@ -133,7 +140,7 @@ class PPTXBuilder:
             # 返回新页的1-based索引
             return len(self.prs.slides)
         except Exception as e:
-            print(f"添加幻灯片失败: {e}")
+            get_logger().echo(f"添加幻灯片失败: {e}")
             return -1
     
     # 内容操作（委托给ContentRenderer）
@@ -143,6 +150,7 @@ class PPTXBuilder:
                     font_italic: bool = False, text_color: Optional[str] = None, 
                     alignment: str = "left") -> Optional[object]:
         """添加文本框"""
+        self._pristine_template = None
         return self.renderer.add_text_box(slide_index, text, left, top, width, height, 
                                         font_name, font_size, font_bold, font_italic, 
                                         text_color, alignment)
@@ -150,33 +158,40 @@ class PPTXBuilder:
     def insert_image(self, slide_index: int, image_path: str, left: float = 1.0, top: float = 1.0, 
                     width: float = None, height: float = None, caption: str = None) -> Optional[object]:
         """插入图片"""
+        self._pristine_template = None
         return self.renderer.insert_image(slide_index, image_path, left, top, width, height, caption)
     
     def insert_table(self, slide_index: int, rows: int, cols: int, data: Optional[List[List[str]]] = None, 
                     left: float = 1.0, top: float = 1.0, width: float = 6.0, height: float = 3.0, 
                     caption: str = None) -> Optional[object]:
         """插入表格"""
+        self._pristine_template = None
         return self.renderer.insert_table(slide_index, rows, cols, data, left, top, width, height, caption)
     
     # 幻灯片构建操作（委托给SlideBuilder）
     def add_title_slide(self, data: dict) -> int:
         """添加标题页"""
+        self._pristine_template = None
         return self.slide_builder.add_title_slide(data)
     
     def add_toc_slide(self, data: dict) -> int:
         """添加目录页"""
+        self._pristine_template = None
         return self.slide_builder.add_toc_slide(data)
     
-    def add_subsection_slides(self, subsections: list) -> int:
+    def add_subsection_slides(self, subsections: Iterable[dict]) -> int:
         """添加子章节页面"""
+        self._pristine_template = None
         return self.slide_builder.add_subsection_slides(subsections)
     
     def add_chapter_divider_slide(self, chapter_number: int, chapter_title: str) -> int:
         """添加章节分隔页"""
+        self._pristine_template = None
         return self.slide_builder.add_chapter_divider_slide(chapter_number, chapter_title)
     
     def add_thanks_slide(self) -> int:
         """添加致谢页"""
+        self._pristine_template = None
         return self.slide_builder.add_thanks_slide()
     
     # 字体计算操作（委托给FontCalculator）
@@ -193,59 +208,84 @@ class PPTXBuilder:
         return self.font_calc.calculate_table_font_size(table_height, rows, cols, content_type)
     
     # from-md 主要功能
-    def from_md(self, md_path: str, template_path: str, output_path: str) -> str:
-        """从Markdown文件生成PPT"""
+    def from_md(self, md_path: str, template_path: str,
+                output_path: Union[str, BinaryIO]) -> Union[str, BinaryIO]:
+        """从Markdown文件生成PPT，output_path 可以是文件路径或可写的二进制流"""
         # 解析 Markdown，并在不增加页数的前提下修改模板第一页，保存到输出
-        if not os.path.exists(md_path):
-            raise FileNotFoundError(f"Markdown 文件不存在: {md_path}")
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"模板不存在: {template_path}")
+        # 直接读取 Markdown，不存在时由 open 抛出，省去单独的存在性检查
+        try:
+            md_text = read_text(md_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Markdown 文件不存在: {md_path}") from None
+        # 记录 Markdown 所在目录，供图片相对路径解析
+        return self.from_md_string(md_text, template_path, output_path, os.path.dirname(md_path))
+    
+    def from_md_string(self, md_text: str, template_path: Union[str, bytes],
+                       output_path: Union[str, BinaryIO],
+                       md_base_dir: Optional[str] = None) -> Union[str, BinaryIO]:
+        """
+        从Markdown字符串生成PPT（无需落盘），md_base_dir 用于解析图片相对路径
         
-        md_text = read_text(md_path)
+        template_path 也可以直接传入模板文件的字节内容，由调用方缓存以免每次读盘
+        """
+        if isinstance(template_path, (bytes, bytearray)):
+            template_src = io.BytesIO(template_path)
+        else:
+            # 模板交给 python-pptx 打开，它对缺失文件报的是 PackageNotFoundError，这里保留检查
+            if not os.path.exists(template_path):
+                raise FileNotFoundError(f"模板不存在: {template_path}")
+            template_src = template_path
         
-        # 记录 Markdown 所在目录，供图片相对路径解析
-        try:
-            self.md_base_dir = os.path.dirname(md_path)
+        self.md_base_dir = md_base_dir or None
+        if self.md_base_dir:
             self.renderer.set_md_base_dir(self.md_base_dir)
-        except Exception:
-            self.md_base_dir = None
         
-        data = parse_md_for_ppt_structure(md_text)
-        print(data)
+        # 生成过程中的进度信息先写入日志缓冲，结束时（含异常）一次写出
+        echo = get_logger().echo
+        try:
+            data = parse_md_for_ppt_structure(md_text)
+            echo(str(data))
 
-        # 使用模板初始化，并修改第一页和目录页
-        self.prs = Presentation(template_path)
-        # 重新初始化组件以使用新的presentation
-        self._reinit_components()
-        if self.md_base_dir:
-            self.renderer.set_md_base_dir(self.md_base_dir)
+            # 使用模板初始化，并修改第一页和目录页；构造时已加载同一模板且未改动过则直接复用
+            if template_src is not template_path or self._pristine_template != os.path.abspath(template_path):
+                self.prs = self._Presentation(template_src)
+                # 重新初始化组件以使用新的presentation
+                self._reinit_components()
+                if self.md_base_dir:
+                    self.renderer.set_md_base_dir(self.md_base_dir)
+            self._pristine_template = None
         
-        if len(self.prs.slides) == 0:
-            raise ValueError("模板中不存在任何幻灯片，无法修改第一页")
+            if len(self.prs.slides) == 0:
+                raise ValueError("模板中不存在任何幻灯片，无法修改第一页")
         
-        # 更新标题页
-        self.add_title_slide(data)
+            # 更新标题页
+            self.add_title_slide(data)
         
-        # 更新目录页（如果存在第二页）
-        if len(self.prs.slides) >= 2:
-            self.add_toc_slide(data)
-        else:
-            print("警告: 模板中不存在第二页，跳过目录页更新")
+            # 更新目录页（如果存在第二页）
+            if len(self.prs.slides) >= 2:
+                self.add_toc_slide(data)
+            else:
+                echo("警告: 模板中不存在第二页，跳过目录页更新")
 
-        # 添加子章节内容页面（每个1.1、1.2等子标题单独成页）
-        subsections = extract_subsection_content_from_md(md_text)
-        if subsections:
-            slides_added = self.add_subsection_slides(subsections)
-            print(f"已添加 {slides_added} 个子章节幻灯片（包含章节分隔页）")
-        else:
-            print("警告: 未找到子章节内容，跳过子章节页面生成")
+            # 添加子章节内容页面（每个1.1、1.2等子标题单独成页）
+            # 子章节按需逐个解析，先取第一个判断是否为空
+            subsections = extract_subsection_content_from_md(md_text)
+            first = next(subsections, None)
+            if first is not None:
+                slides_added = self.add_subsection_slides(chain((first,), subsections))
+                echo(f"已添加 {slides_added} 个子章节幻灯片（包含章节分隔页）")
+            else:
+                echo("警告: 未找到子章节内容，跳过子章节页面生成")
 
-        # 添加致谢页
-        thanks_added = self.add_thanks_slide()
-        if thanks_added:
-            print("已在最后添加致谢页")
+            # 添加致谢页
+            thanks_added = self.add_thanks_slide()
+            if thanks_added:
+                echo("已在最后添加致谢页")
 
-        # 保存到输出
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        self.prs.save(output_path)
+            # 保存到输出（支持直接写入流，避免临时文件）
+            if not hasattr(output_path, 'write'):
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            self.prs.save(output_path)
+        finally:
+            get_logger().flush()
         return output_path
@@ -3,16 +3,8 @@
 """
 
 import re
-import os
-import sys
-from typing import Optional
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN
-from pptx.dml.color import RGBColor
-
-# 添加项目根目录到Python路径
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, Optional
 
 from utils.pptx_utils import (
     update_text_preserve_format,
@@ -21,15 +13,49 @@ from utils.pptx_utils import (
 )
 from .content_renderer import ContentRenderer
 from .font_calculator import FontCalculator
+from .layout_manager import LayoutManager
+from .logger import get_logger
+
+if TYPE_CHECKING:
+    from pptx.presentation import Presentation
+
+# 标题编号前缀："1.1 " / "1. "
+_SUBSEC_NUM_RE = re.compile(r'^\d+\.\d+\s*')
+_CHAP_NUM_RE = re.compile(r'^\d+\.\s*')
+
+# 章节分隔页占位符（根据模板分析）：
+# - "0X"是 BODY 类型，索引14 的占位符
+# - "目录标题"是 OBJECT 类型，索引13 的占位符
+# 子章节页标题框与内容框（EMU，1英寸 = 914400；python-pptx 直接接受整数长度）
+_EMU_PER_INCH = 914400
+_SUBSEC_LEFT = int(1.0 * _EMU_PER_INCH)     # 左边距
+_SUBSEC_TOP = int(0.15 * _EMU_PER_INCH)     # 顶部位置，在蓝色背景条内
+_SUBSEC_WIDTH = int(11.0 * _EMU_PER_INCH)   # 宽度，几乎占满
+_SUBSEC_HEIGHT = int(0.5 * _EMU_PER_INCH)   # 高度
+_CONTENT_TOP_IN = 1.0      # 内容区域顶部（英寸，布局计算使用）
+_CONTENT_HEIGHT_IN = 5.8   # 内容区域高度（英寸）
+_CONTENT_TOP = int(_CONTENT_TOP_IN * _EMU_PER_INCH)
+_CONTENT_HEIGHT = int(_CONTENT_HEIGHT_IN * _EMU_PER_INCH)
+
+# 标题拆分为纯字符串运算，同一标题在重复生成时直接复用结果
+_split_title = lru_cache(maxsize=32)(split_title_by_length)
+
+_DIVIDER_ACTIONS = {('BODY', 14): 'num', ('OBJECT', 13): 'title'}
+_DIVIDER_REMOVE_TYPES = frozenset(('CENTER_TITLE', 'SUBTITLE', 'DATE', 'FOOTER', 'SLIDE_NUMBER'))
 
 
 class SlideBuilder:
     """幻灯片构建器，负责特定类型幻灯片的构建"""
     
-    def __init__(self, presentation: Presentation, content_renderer: ContentRenderer, font_calculator: FontCalculator):
+    def __init__(self, presentation: 'Presentation', content_renderer: ContentRenderer, font_calculator: FontCalculator,
+                 layout_manager: Optional[LayoutManager] = None):
         self.prs = presentation
         self.renderer = content_renderer
         self.font_calc = font_calculator
+        # 与 PPTXBuilder 共用同一个布局管理器，未传入时自行创建
+        self.layout_manager = layout_manager or LayoutManager(content_renderer, font_calculator)
+        # 逐页的进度信息写入日志缓冲，由 PPTXBuilder 在生成结束时统一 flush
+        self._echo = get_logger().echo
         
         # 存储章节信息，用于动态获取章节标题
         self.chapters_info = {}  # {chapter_number: chapter_title}
@@ -51,8 +77,8 @@ class SlideBuilder:
             if len(slide.shapes) >= 3:
                 # 标题文本框 (形状0) - 自动拆分为两行
                 if title:
-                    formatted_title = split_title_by_length(title)
-                    print(formatted_title)
+                    formatted_title = _split_title(title)
+                    self._echo(formatted_title)
                     update_text_preserve_format(slide.shapes[0], formatted_title)
                 
                 # 单位文本框 (形状1)  
@@ -64,7 +90,7 @@ class SlideBuilder:
                     update_text_preserve_format(slide.shapes[2], date)
 
         except Exception as e:
-            print(f"修改标题页文本时出错: {e}")
+            self._echo(f"修改标题页文本时出错: {e}")
         
         return 1
     
@@ -81,15 +107,23 @@ class SlideBuilder:
             smart_update_toc_items(slide, toc_items)
                     
         except Exception as e:
-            print(f"修改目录页时出错: {e}")
+            self._echo(f"修改目录页时出错: {e}")
         
         return 2
     
-    def add_subsection_slides(self, subsections: list) -> int:
+    def add_subsection_slides(self, subsections: Iterable[dict]) -> int:
         """为每个子章节(### 1.1, 1.2等)添加单独的页面"""
         if not subsections:
             return 0
         
+        from pptx.dml.color import RGBColor
+        from pptx.enum.text import PP_ALIGN
+        from pptx.util import Pt
+        
+        # 标题样式对所有子章节相同：白色字体，字号按固定0.5英寸的标题区域计算
+        white = RGBColor(0xFF, 0xFF, 0xFF)
+        title_font_size = Pt(self.font_calc.calculate_title_font_size(0.5))
+        
         # 使用布局1："标题和内容"
         layout = self.prs.slide_layouts[1]
         slides_added = 0
@@ -115,14 +149,11 @@ class SlideBuilder:
                 slides_added += 1
                 
                 # 去掉子章节标题中的编号（如"1.1 办公痛点" -> "办公痛点驱动自动化需求"）
-                clean_subsection_title = re.sub(r'^\d+\.\d+\s*', '', subsection['title'])
+                clean_subsection_title = _SUBSEC_NUM_RE.sub('', subsection['title'])
                 
                 # 在蓝色背景区域添加子章节标题
                 subsection_title_textbox = slide.shapes.add_textbox(
-                    Inches(1.0),    # 左边距
-                    Inches(0.15),   # 顶部位置，在蓝色背景条内
-                    Inches(11.0),   # 宽度，几乎占满
-                    Inches(0.5)     # 高度
+                    _SUBSEC_LEFT, _SUBSEC_TOP, _SUBSEC_WIDTH, _SUBSEC_HEIGHT
                 )
                 
                 # 设置子章节标题内容和格式
@@ -134,39 +165,32 @@ class SlideBuilder:
                 
                 # 设置标题格式：白色字体，居中，加粗
                 title_run.font.name = '微软雅黑'
-                # 根据标题区域高度自动调整字体大小
-                title_font_size = self.font_calc.calculate_title_font_size(0.5)  # 标题区域固定0.5英寸
-                title_run.font.size = Pt(title_font_size)
+                title_run.font.size = title_font_size
                 title_run.font.bold = True
-                title_run.font.color.rgb = RGBColor(0xFF, 0xFF, 0xFF)  # 白色字体
+                title_run.font.color.rgb = white
                 title_para.alignment = PP_ALIGN.CENTER  # 居中对齐
                 
-                print(f"已添加子章节标题: {clean_subsection_title} (原标题: {subsection['title']})")
+                self._echo(f"已添加子章节标题: {clean_subsection_title} (原标题: {subsection['title']})")
                 
                 # 创建内容区域（在子章节标题下方）
-                content_top = 1.0   # 在标题下方开始
-                content_height = 5.8  # 内容区域高度
                 content_textbox = slide.shapes.add_textbox(
-                    Inches(1.0),    # 左边距
-                    Inches(content_top),     # 内容顶部
-                    Inches(11.0),   # 宽度
-                    Inches(content_height)   # 高度
+                    _SUBSEC_LEFT, _CONTENT_TOP, _SUBSEC_WIDTH, _CONTENT_HEIGHT
                 )
                 
                 # 智能布局自动匹配
-                from .layout_manager import LayoutManager
-                layout_manager = LayoutManager(self.renderer, self.font_calc)
-                layout_manager.add_content_auto_layout(slide, subsection['content_blocks'], content_top, content_height)
+                self.layout_manager.add_content_auto_layout(slide, subsection['content_blocks'], _CONTENT_TOP_IN, _CONTENT_HEIGHT_IN)
                 
-                print(f"已添加子章节: {clean_subsection_title}")
+                self._echo(f"已添加子章节: {clean_subsection_title}")
                 
             except Exception as e:
-                print(f"添加子章节'{subsection['title']}'时出错: {e}")
+                self._echo(f"添加子章节'{subsection['title']}'时出错: {e}")
         
         return slides_added
     
     def add_chapter_divider_slide(self, chapter_number: int, chapter_title: str) -> int:
         """添加章节分隔页，使用布局2 '2_标题幻灯片'，包含'0X'和'章节标题'占位符"""
+        from pptx.enum.text import PP_ALIGN
+        
         try:
             # 使用布局2："2_标题幻灯片"，现在包含"0X"和"目录标题"占位符
             layout2 = self.prs.slide_layouts[2]
@@ -178,64 +202,58 @@ class SlideBuilder:
             ox_updated = False
             title_updated = False
             
-            for shape in divider_slide.shapes:
-                if hasattr(shape, 'is_placeholder') and shape.is_placeholder:
-                    try:
-                        ph_type = shape.placeholder_format.type.name
-                        ph_idx = shape.placeholder_format.idx
-                        
-                        # 根据模板分析：
-                        # - "0X"是 BODY 类型，索引14 的占位符
-                        # - "目录标题"是 OBJECT 类型，索引13 的占位符
-                        if ph_type == 'BODY' and ph_idx == 14:
-                            # 更新章节编号并确保居中对齐
-                            shape.text = f"{chapter_number:02d}"
-                            # 强制设置居中对齐
-                            if shape.text_frame and shape.text_frame.paragraphs:
-                                para = shape.text_frame.paragraphs[0]
-                                para.alignment = PP_ALIGN.CENTER
-                            ox_updated = True
-                            print(f"  更新章节编号占位符 (BODY-14): {chapter_number:02d} [居中对齐]")
-                        
-                        elif ph_type == 'OBJECT' and ph_idx == 13:
-                            # 去掉章节标题中的编号（如"1. "、"2. "等）
-                            clean_title = re.sub(r'^\d+\.\s*', '', chapter_title)
-                            # 更新章节标题并保持原有格式
-                            update_text_preserve_format(shape, clean_title)
-                            title_updated = True
-                            print(f"  更新章节标题占位符 (OBJECT-13): {clean_title} (原标题: {chapter_title})")
-                        
-                    except Exception as e:
-                        print(f"  处理占位符时出错: {e}")
-            
-            # 删除其他不需要的占位符（保留0X和标题占位符）
+            # 一次遍历完成占位符的更新与删除分类
             shapes_to_remove = []
             for shape in divider_slide.shapes:
-                if hasattr(shape, 'is_placeholder') and shape.is_placeholder:
-                    try:
-                        # 检查占位符类型，只保留我们需要的
-                        if hasattr(shape, 'placeholder_format'):
-                            ph_type = shape.placeholder_format.type.name
-                            # 删除标题、副标题、日期、页脚、页码等占位符，保留内容相关的
-                            if ph_type in ['CENTER_TITLE', 'SUBTITLE', 'DATE', 'FOOTER', 'SLIDE_NUMBER']:
-                                shapes_to_remove.append(shape)
-                    except:
-                        # 如果无法确定占位符类型，检查文本内容
-                        if hasattr(shape, 'text') and shape.text:
-                            if '0X' not in shape.text and '标题' not in shape.text:
-                                if any(word in shape.text for word in ['单击此处', '编辑']):
-                                    shapes_to_remove.append(shape)
+                if not getattr(shape, 'is_placeholder', False):
+                    continue
+                try:
+                    pf = shape.placeholder_format
+                    ph_type = pf.type.name
+                    ph_idx = pf.idx
+                except Exception as e:
+                    self._echo(f"  处理占位符时出错: {e}")
+                    # 如果无法确定占位符类型，检查文本内容
+                    text = getattr(shape, 'text', '')
+                    if text and '0X' not in text and '标题' not in text:
+                        if any(word in text for word in ('单击此处', '编辑')):
+                            shapes_to_remove.append(shape)
+                    continue
+                
+                action = _DIVIDER_ACTIONS.get((ph_type, ph_idx))
+                if action is None:
+                    # 删除标题、副标题、日期、页脚、页码等占位符，保留内容相关的
+                    if ph_type in _DIVIDER_REMOVE_TYPES:
+                        shapes_to_remove.append(shape)
+                    continue
+                
+                try:
+                    if action == 'num':
+                        # 更新章节编号并确保居中对齐
+                        shape.text = f"{chapter_number:02d}"
+                        if shape.text_frame and shape.text_frame.paragraphs:
+                            shape.text_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+                        ox_updated = True
+                        self._echo(f"  更新章节编号占位符 (BODY-14): {chapter_number:02d} [居中对齐]")
+                    else:
+                        # 去掉章节标题中的编号（如"1. "、"2. "等），保持原有格式
+                        clean_title = _CHAP_NUM_RE.sub('', chapter_title)
+                        update_text_preserve_format(shape, clean_title)
+                        title_updated = True
+                        self._echo(f"  更新章节标题占位符 (OBJECT-13): {clean_title} (原标题: {chapter_title})")
+                except Exception as e:
+                    self._echo(f"  处理占位符时出错: {e}")
             
             # 删除不需要的占位符
             for shape in shapes_to_remove:
                 sp = shape._element
                 sp.getparent().remove(sp)
             
-            print(f"已添加章节{chapter_number:02d}分隔页: {chapter_title} (占位符更新: 编号={ox_updated}, 标题={title_updated})")
+            self._echo(f"已添加章节{chapter_number:02d}分隔页: {chapter_title} (占位符更新: 编号={ox_updated}, 标题={title_updated})")
             return 1
                 
         except Exception as e:
-            print(f"添加章节分隔页时出错: {e}")
+            self._echo(f"添加章节分隔页时出错: {e}")
             return 0
     
     def add_thanks_slide(self) -> int:
@@ -259,20 +277,17 @@ class SlideBuilder:
                 sp = shape._element
                 sp.getparent().remove(sp)
             
-            print(f"已删除 {len(shapes_to_remove)} 个占位符")
+            self._echo(f"已删除 {len(shapes_to_remove)} 个占位符")
             
-            print("已添加致谢页（使用标题占位符）")
+            self._echo("已添加致谢页（使用标题占位符）")
             return 1
                 
         except Exception as e:
-            print(f"添加致谢页时出错: {e}")
+            self._echo(f"添加致谢页时出错: {e}")
             return 0
     
     def _get_chapter_title(self, chapter_number: int) -> str:
         """根据章节编号获取章节标题，优先从已解析的章节信息中获取"""
-        # 首先从self.chapters_info中获取（如果从md文件解析过）
-        if chapter_number in self.chapters_info:
-            return self.chapters_info[chapter_number]
-        
-        # 如果没有解析过，使用默认格式
-        return f"{chapter_number}. 章节标题"
\ No newline at end of file
+        # 首先从self.chapters_info中获取（如果从md文件解析过），否则使用默认格式
+        title = self.chapters_info.get(chapter_number)
+        return title if title is not None else f"{chapter_number}. 章节标题"
\ No newline at end of file
@@ -8,16 +8,107 @@ PPTX MCP 服务实现（后端逻辑）
 输出：上传到 MinIO 的 PPTX 文件 URL
 """
 
+import asyncio
+import io
+import multiprocessing
 import os
-import tempfile
+import threading
 import uuid
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import List, Optional, Sequence
 
 from core.pptx_engine import PPTXBuilder
-from core.minio_service import MinIOService
+from core.minio_service import get_minio_service
 from core.pptx_engine.logger import get_logger
 
 
+# PPTX 构建是 CPU 密集的纯 Python 代码，放到独立进程中执行以避开 GIL；
+# PPTX_BUILD_WORKERS=0 时在当前进程内构建
+_BUILD_POOL = None
+_BUILD_POOL_LOCK = threading.Lock()
+
+# 批量转换时的上传线程池，与构建并行
+_UPLOAD_POOL = None
+
+
+def _get_build_pool() -> Optional[ProcessPoolExecutor]:
+    """首次使用时创建构建进程池（spawn 方式，避免在多线程进程中 fork）"""
+    global _BUILD_POOL
+    if _BUILD_POOL is None:
+        with _BUILD_POOL_LOCK:
+            if _BUILD_POOL is None:
+                workers = int(os.getenv("PPTX_BUILD_WORKERS", str(os.cpu_count() or 1)))
+                if workers <= 0:
+                    return None
+                _BUILD_POOL = ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+    return _BUILD_POOL
+
+
+def _discard_build_pool(pool: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的构建进程池（工作进程被 OOM 杀死等），下次使用时重新创建"""
+    global _BUILD_POOL
+    with _BUILD_POOL_LOCK:
+        if _BUILD_POOL is pool:
+            _BUILD_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_upload_pool() -> ThreadPoolExecutor:
+    global _UPLOAD_POOL
+    if _UPLOAD_POOL is None:
+        with _BUILD_POOL_LOCK:
+            if _UPLOAD_POOL is None:
+                _UPLOAD_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pptx-upload")
+    return _UPLOAD_POOL
+
+
+@lru_cache(maxsize=4)
+def _read_template(template_path: str, mtime: float) -> bytes:
+    """模板文件内容，按 (路径, 修改时间) 在每个进程内缓存"""
+    with open(template_path, 'rb') as f:
+        return f.read()
+
+
+def _build_pptx_worker(md_content: str, template_path: str) -> bytes:
+    """由Markdown内容生成PPTX，返回文件字节（在构建进程中执行，全程在内存中完成）"""
+    template = _read_template(template_path, os.stat(template_path).st_mtime)
+    pptx_buf = io.BytesIO()
+    PPTXBuilder().from_md_string(md_content, template, pptx_buf)
+    return pptx_buf.getvalue()
+
+
+def _build_pptx(md_content: str, template_path: str) -> bytes:
+    """在构建进程池中生成PPTX；进程池损坏时重建并重试一次，仍失败则在当前进程内构建"""
+    for _ in range(2):
+        pool = _get_build_pool()
+        if pool is None:
+            break
+        try:
+            return pool.submit(_build_pptx_worker, md_content, template_path).result()
+        except BrokenProcessPool:
+            _discard_build_pool(pool)
+            get_logger().log_warning("构建进程池已损坏，重建后重试", "MCPService")
+    return _build_pptx_worker(md_content, template_path)
+
+
+async def _build_pptx_async(md_content: str, template_path: str) -> bytes:
+    """_build_pptx 的异步版本"""
+    loop = asyncio.get_running_loop()
+    for _ in range(2):
+        pool = _get_build_pool()
+        if pool is None:
+            break
+        try:
+            return await loop.run_in_executor(pool, _build_pptx_worker, md_content, template_path)
+        except BrokenProcessPool:
+            _discard_build_pool(pool)
+            get_logger().log_warning("构建进程池已损坏，重建后重试", "MCPService")
+    return await asyncio.to_thread(_build_pptx_worker, md_content, template_path)
+
+
 class PPTXMCPService:
     """PPTX MCP服务类（纯后端实现）"""
 
@@ -34,65 +125,119 @@ class PPTXMCPService:
         if not os.path.exists(self.template_path):
             raise FileNotFoundError(f"PPTX模板文件不存在: {self.template_path}")
 
-        # MinIO
-        self.minio_service = MinIOService()
+        # MinIO（进程内共享客户端）
+        self.minio_service = get_minio_service()
         self.logger.log_success("MinIO服务初始化成功", "MCPService")
 
         # 日志控制开关（如需可在此读取并覆写配置文件，但当前保持全局配置）
         self.enable_logging = enable_logging
 
-    def convert_md_to_pptx_url(self, md_content: str, filename: Optional[str] = None) -> str:
-        """将Markdown内容转换为PPTX并上传到MinIO，返回URL"""
+    @staticmethod
+    def _normalize_filename(filename: Optional[str]) -> str:
         # 生成文件名
         if not filename:
             filename = f"presentation_{uuid.uuid4().hex[:8]}.pptx"
         if not filename.endswith(".pptx"):
             filename += ".pptx"
+        return filename
 
-        # 临时文件
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as temp_md:
-            temp_md.write(md_content)
-            temp_md_path = temp_md.name
-
-        with tempfile.NamedTemporaryFile(suffix='.pptx', delete=False) as temp_pptx:
-            temp_pptx_path = temp_pptx.name
+    def _build(self, md_content: str, filename: str) -> bytes:
+        """生成PPTX字节；有构建进程池时提交到进程池"""
+        self.logger.log_progress(f"开始转换Markdown到PPTX: {filename}")
+        self.logger.flush()
+        return self._check_built(_build_pptx(md_content, self.template_path))
 
+    def _check_built(self, data: bytes) -> bytes:
+        # 日志缓冲在每个构建步骤结束时写出，服务日志不必等到缓冲写满或进程退出
         try:
-            self.logger.log_progress(f"开始转换Markdown到PPTX: {filename}")
-
-            builder = PPTXBuilder()
-            result_path = builder.from_md(temp_md_path, self.template_path, temp_pptx_path)
-
-            if not os.path.exists(result_path):
+            if not data:
                 raise RuntimeError("PPTX文件生成失败")
+            self.logger.log_success(f"PPTX文件生成成功: {len(data):,} 字节", "MCPService")
+            return data
+        finally:
+            self.logger.flush()
 
-            file_size = os.path.getsize(result_path)
-            self.logger.log_success(f"PPTX文件生成成功: {file_size:,} 字节", "MCPService")
-
-            # 上传 MinIO
-            self.logger.log_progress(f"开始上传文件到MinIO: {filename}")
-            minio_url = self.minio_service.upload_file(result_path, object_name=filename)
+    def _upload(self, data: bytes, filename: str) -> str:
+        """上传 MinIO，返回URL"""
+        self.logger.log_progress(f"开始上传文件到MinIO: {filename}")
+        try:
+            # 临时性错误（5xx、连接失败）由 MinIO 客户端连接池的 urllib3 Retry 重试
+            minio_url = self.minio_service.upload_stream(io.BytesIO(data), len(data), filename)
             self.logger.log_success(f"文件上传成功: {minio_url}", "MCPService")
             return minio_url
-
         finally:
-            # 清理临时文件
-            try:
-                if os.path.exists(temp_md_path):
-                    os.unlink(temp_md_path)
-                if os.path.exists(temp_pptx_path):
-                    os.unlink(temp_pptx_path)
-            except Exception as e:
-                self.logger.log_warning(f"清理临时文件失败: {e}", "MCPService")
+            self.logger.flush()
+
+    def convert_md_to_pptx_url(self, md_content: str, filename: Optional[str] = None) -> str:
+        """将Markdown内容转换为PPTX并上传到MinIO，返回URL"""
+        filename = self._normalize_filename(filename)
+        return self._upload(self._build(md_content, filename), filename)
+
+    def convert_many_md_to_pptx_urls(self, md_list: Sequence[str],
+                                     filenames: Optional[Sequence[Optional[str]]] = None) -> List[str]:
+        """
+        批量转换：构建完成一个即提交上传，上传与后续构建重叠；返回与输入顺序一致的URL列表
+
+        任一构建失败时不再开始新的构建（尚未运行的取消），等已提交的上传结束后抛出该异常；
+        上传失败时同样等全部上传结束后，按输入顺序抛出第一个失败
+        """
+        if filenames is not None and len(filenames) != len(md_list):
+            raise ValueError(f"filenames 数量 ({len(filenames)}) 与 md_list 数量 ({len(md_list)}) 不一致")
+        names = [self._normalize_filename(filenames[i] if filenames else None) for i in range(len(md_list))]
+        upload_pool = _get_upload_pool()
+        pool = _get_build_pool()
+        uploads = [None] * len(md_list)
+        build_error = None
+        if pool is None:
+            for i, md_content in enumerate(md_list):
+                try:
+                    data = self._check_built(_build_pptx_worker(md_content, self.template_path))
+                except Exception as e:
+                    build_error = e
+                    break
+                uploads[i] = upload_pool.submit(self._upload, data, names[i])
+        else:
+            builds = {pool.submit(_build_pptx_worker, md_content, self.template_path): i
+                      for i, md_content in enumerate(md_list)}
+            for future in as_completed(builds):
+                i = builds[future]
+                try:
+                    try:
+                        data = future.result()
+                    except BrokenProcessPool:
+                        # 进程池损坏：该项走重建/进程内构建的回退路径
+                        data = _build_pptx(md_list[i], self.template_path)
+                    data = self._check_built(data)
+                except Exception as e:
+                    build_error = e
+                    for pending in builds:
+                        pending.cancel()
+                    break
+                uploads[i] = upload_pool.submit(self._upload, data, names[i])
+        # 已提交的上传全部结束后再返回或抛出，避免遗留后台上传
+        wait([f for f in uploads if f is not None])
+        if build_error is not None:
+            raise build_error
+        return [f.result() for f in uploads]
+
+    async def convert_md_to_pptx_url_async(self, md_content: str, filename: Optional[str] = None) -> str:
+        """异步版本：构建在进程池中执行，上传在线程中执行，多个请求的构建与上传可以重叠"""
+        filename = self._normalize_filename(filename)
+        self.logger.log_progress(f"开始转换Markdown到PPTX: {filename}")
+        self.logger.flush()
+        data = self._check_built(await _build_pptx_async(md_content, self.template_path))
+        return await asyncio.to_thread(self._upload, data, filename)
 
 
 _global_service = None
+_service_lock = threading.Lock()
 
 
 def get_service(template_path: Optional[str] = None, enable_logging: bool = False) -> PPTXMCPService:
     global _global_service
+    # 双重检查：已创建时不加锁；并发首次调用只构造一次（MinIO 初始化与模板加载）
     if _global_service is None:
-        _global_service = PPTXMCPService(template_path, enable_logging)
+        with _service_lock:
+            if _global_service is None:
+                _global_service = PPTXMCPService(template_path, enable_logging)
     return _global_service
-
-
@@ -12,10 +12,12 @@ import markdown
 from markdown import Markdown
 from markdown.treeprocessors import Treeprocessor
 import yaml
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, FeatureNotFound, Tag
 from bs4.element import NavigableString
 from typing import Optional
+import io
 import os
+import re
 
 from utils.docx_utils import *
 
@@ -26,19 +28,139 @@ from docx.oxml.ns import qn
 from markdown import Markdown
 from bs4 import BeautifulSoup, Tag
 from bs4.element import NavigableString
-from latex2mathml.converter import convert as latex_to_mathml
-from lxml import etree
+from functools import lru_cache
+import threading
+
+# 共享的Markdown实例（构建扩展较耗时），convert 前 reset；加锁以便多线程服务中共用
+_MD_INSTANCE = Markdown(extensions=['toc', 'tables'])
+_MD_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=32)
+def _md_to_html(md_content: str) -> str:
+    """Markdown转HTML，相同内容直接返回缓存结果（字符串自带哈希缓存，直接作为键）"""
+    with _MD_LOCK:
+        return _MD_INSTANCE.reset().convert(md_content)
+
+
+# 文本中的数学公式：$$...$$（独立公式）或 $...$（行内公式）
+_MATH_RE = re.compile(r"(\$\$(.+?)\$\$)|(\$(.+?)\$)", re.DOTALL)
+# 标题编号格式中的层级占位符，如 "%1.%2"
+_HEADING_TOKEN_RE = re.compile(r'%([1-6])')
+
+_CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+_MML2OMML_XSL = os.path.join(_CONFIG_DIR, 'mml2omml.xsl')
+
+try:
+    _YamlLoader = yaml.CSafeLoader
+except AttributeError:
+    _YamlLoader = yaml.SafeLoader
+
+_CELL_TAGS = frozenset(('th', 'td'))
+
+# 标题计数器（h1-h6）清零时使用的切片来源
+_ZERO_COUNTERS = (0,) * 6
+
+# 常用的 WordprocessingML 限定名
+_QN_EAST_ASIA = qn('w:eastAsia')
+_QN_JC = qn('w:jc')
+_QN_VAL = qn('w:val')
+
+# 配置中的对齐字符串（小写）-> 枚举值
+_PARA_ALIGN = {
+    'left': WD_PARAGRAPH_ALIGNMENT.LEFT,
+    'center': WD_PARAGRAPH_ALIGNMENT.CENTER,
+    'right': WD_PARAGRAPH_ALIGNMENT.RIGHT,
+    'justify': WD_PARAGRAPH_ALIGNMENT.JUSTIFY,
+}
+_TABLE_ALIGN = {
+    'left': WD_TABLE_ALIGNMENT.LEFT,
+    'center': WD_TABLE_ALIGNMENT.CENTER,
+    'right': WD_TABLE_ALIGNMENT.RIGHT,
+}
+
+
+def _para_alignment(name: str):
+    """对齐字符串 -> WD_PARAGRAPH_ALIGNMENT，常用值查表，其余按枚举名查找（无效值抛 AttributeError）"""
+    key = name.lower()
+    if key in _PARA_ALIGN:
+        return _PARA_ALIGN[key]
+    return getattr(WD_PARAGRAPH_ALIGNMENT, name.upper())
+
+
+# 处理后的样式配置缓存: (绝对路径, 修改时间) -> 配置字典（只读，多个实例共享）
+_CONFIG_CACHE = {}
+
+
+@lru_cache(maxsize=4)
+def _load_xslt(xsl_path: str = _MML2OMML_XSL):
+    """加载并编译 MathML->OMML 的 XSLT，进程内只编译一次；加载失败返回 None"""
+    try:
+        from lxml import etree
+        with open(xsl_path, 'rb') as f:
+            xslt_root = etree.XML(f.read())
+        return etree.XSLT(xslt_root)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _latex_to_omml(latex_expr: str) -> Optional[str]:
+    """LaTeX -> MathML -> OMML 字符串，同一公式只转换一次（返回序列化结果，不缓存 lxml 节点）"""
+    # 公式相关依赖只在文档中出现公式时才导入
+    try:
+        from latex2mathml.converter import convert as latex_to_mathml
+        mathml = latex_to_mathml(latex_expr)
+    except Exception:
+        return None
+    try:
+        from lxml import etree
+        transformer = _load_xslt()
+        if transformer is None:
+            return None
+        omml_doc = transformer(etree.fromstring(mathml.encode('utf-8')))
+        return str(omml_doc)
+    except Exception:
+        return None
+
+
+def _parse_html(html_content: str):
+    """
+    解析HTML，返回顶层节点的容器
+    
+    优先使用 C 实现的 lxml 解析器（未安装时回退到 html.parser），它会补全 <html><body>，
+    因此返回 body 以保持与 html.parser 相同的顶层节点。
+    """
+    try:
+        soup = BeautifulSoup(html_content, 'lxml')
+    except FeatureNotFound:
+        return BeautifulSoup(html_content, 'html.parser')
+    return soup.body if soup.body is not None else soup
+
 
 class MarkdownToDocxConverter:
-    def __init__(self, numbering_config='./config/docx_numbering.xml', style_config=None):
+    def __init__(self, numbering_config=os.path.join(_CONFIG_DIR, 'docx_numbering.xml'), style_config=None):
         self.numbering_config = numbering_config
         self.style_config = self.load_config()
         self.counters = [0] * 6
-        self._xslt_transform = None
+        # 各级标题的 (样式配置, 编号格式)，加载配置时一次性解析
+        self._heading_cfgs = {level: self._resolve_heading_config(level) for level in range(1, 7)}
+        # 图片字节缓存: (绝对路径, 修改时间) -> bytes，重复出现的图片不再读盘
+        self._image_cache = {}
+
+    def load_config(self, config_path=os.path.join(_CONFIG_DIR, 'docx_config.yaml')):
+        config_path = os.path.abspath(config_path)
+        key = (config_path, os.stat(config_path).st_mtime)
+        config = _CONFIG_CACHE.get(key)
+        if config is None:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = yaml.load(f, Loader=_YamlLoader)
+            config = _CONFIG_CACHE[key] = self._process_config(config)
+        return config
 
-    def load_config(self, config_path="/home/yzy/document/project/AI_office-main/config/docx_config.yaml"):
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+    @staticmethod
+    def _process_config(config):
+        """将字号、颜色、间距等配置转换为 docx 对象（Pt/RGBColor）"""
         
         def process_config_section(section):
             if isinstance(section, dict):
@@ -111,13 +233,12 @@ class MarkdownToDocxConverter:
     
     def _update_counters(self, level):
         """更新标题计数器"""
-        self.counters[level-1] += 1
-        for i in range(level, len(self.counters)):
-            self.counters[i] = 0
+        counters = self.counters
+        counters[level-1] += 1
+        counters[level:] = _ZERO_COUNTERS[level:]
     
-    def _process_heading(self, element, level):
-        """处理标题元素（带多级编号）"""
-        self._update_counters(level)
+    def _resolve_heading_config(self, level):
+        """解析某级标题的样式配置与编号格式"""
         # 获取标题配置，如果不存在则使用默认配置
         heading_config = self.style_config.get('headings', {}).get(f'h{level}', {})
         if not heading_config:
@@ -127,26 +248,49 @@ class MarkdownToDocxConverter:
                 'font': default_config.get('font', {}),
                 'paragraph': default_config.get('paragraph', {})
             }
+        fmt = heading_config.get('numbering', {}).get('format')
+        return heading_config, fmt
+
+    def _bake_heading_style(self, level, font_config):
+        """将字体配置写入文档的 'Heading N' 样式（每个文档每级一次）"""
+        style = self.doc.styles[f'Heading {level}']
+        if 'western' in font_config:
+            style.font.name = font_config['western']
+        if 'east_asian' in font_config:
+            style._element.rPr.rFonts.set(_QN_EAST_ASIA, font_config['east_asian'])
+        if 'size' in font_config:
+            style.font.size = font_config['size']
+        if 'color' in font_config:
+            style.font.color.rgb = font_config['color']
+        if 'bold' in font_config:
+            style.font.bold = font_config['bold']
+        if 'italic' in font_config:
+            style.font.italic = font_config['italic']
+        self._baked_heading_levels.add(level)
+
+    def _get_numbering_style(self):
+        """文档中的 'ProgrammaticNumberingStyle' 样式（每个文档只查找一次，不存在时为 None）"""
+        if self._numbering_style is False:
+            try:
+                self._numbering_style = self.doc.styles['ProgrammaticNumberingStyle']
+            except Exception:
+                self._numbering_style = None
+        return self._numbering_style
+
+    def _process_heading(self, element, level):
+        """处理标题元素（带多级编号）"""
+        self._update_counters(level)
+        heading_config, fmt = self._heading_cfgs[level]
         # 使用内置标题（仅用于层级/样式），编号使用前缀文本实现
         heading = self.doc.add_heading('', level=level)
         
         # 生成前缀文本编号（依据配置的 numbering.format）
         heading_text = element.get_text()
-        numbering_cfg = heading_config.get('numbering', {})
-        fmt = numbering_cfg.get('format')
         prefix = ''
         if fmt:
-            import re as _re
-            tokens = _re.findall(r'%([1-6])', fmt)
-            if tokens:
-                values = []
-                for t in tokens:
-                    idx = int(t)
-                    values.append(str(self.counters[idx]))
-                def _rep(m):
-                    i = int(m.group(1))
-                    return values[tokens.index(str(i))]
-                prefix = _re.sub(r'%([1-6])', _rep, fmt)
+            if _HEADING_TOKEN_RE.search(fmt):
+                counters = self.counters
+                prefix = _HEADING_TOKEN_RE.sub(lambda m: str(counters[int(m.group(1))]), fmt)
         else:
             mapped_ilvl = max(0, level - 2)
             if mapped_ilvl >= 0:
@@ -157,27 +301,22 @@ class MarkdownToDocxConverter:
             prefix += ' '
         run = heading.add_run(prefix + heading_text)
         
-        # 应用字体样式
+        # 应用字体样式：样式级属性每个文档每级只写一次，run 级属性逐个设置
         font_config = heading_config.get('font', {})
         if font_config:
-            # 设置样式字体
+            if level not in self._baked_heading_levels:
+                self._bake_heading_style(level, font_config)
             if 'western' in font_config:
-                self.doc.styles[f'Heading {level}'].font.name = font_config['western']
                 run.font.name = font_config['western']
             if 'east_asian' in font_config:
-                self.doc.styles[f'Heading {level}']._element.rPr.rFonts.set(qn('w:eastAsia'), font_config['east_asian'])
-                run._element.rPr.rFonts.set(qn('w:eastAsia'), font_config['east_asian'])
+                run._element.rPr.rFonts.set(_QN_EAST_ASIA, font_config['east_asian'])
             if 'size' in font_config:
-                self.doc.styles[f'Heading {level}'].font.size = font_config['size']
                 run.font.size = font_config['size']
             if 'color' in font_config:
-                self.doc.styles[f'Heading {level}'].font.color.rgb = font_config['color']
                 run.font.color.rgb = font_config['color']
             if 'bold' in font_config:
-                self.doc.styles[f'Heading {level}'].font.bold = font_config['bold']
                 run.font.bold = font_config['bold']
             if 'italic' in font_config:
-                self.doc.styles[f'Heading {level}'].font.italic = font_config['italic']
                 run.font.italic = font_config['italic']
         
         # 段落设置
@@ -185,24 +324,23 @@ class MarkdownToDocxConverter:
         if para_config:
             if 'alignment' in para_config:
                 # 强制设置对齐，覆盖默认样式
-                alignment_value = getattr(WD_PARAGRAPH_ALIGNMENT, para_config['alignment'].upper())
+                alignment_value = _para_alignment(para_config['alignment'])
                 heading.alignment = alignment_value
                 # 同时设置段落格式的对齐
                 heading.paragraph_format.alignment = alignment_value
                 # 关键：同步到样式，避免样式里的默认居中覆盖
-                try:
-                    self.doc.styles['ProgrammaticNumberingStyle'].paragraph_format.alignment = alignment_value
-                except Exception:
-                    pass
+                numbering_style = self._get_numbering_style()
+                if numbering_style is not None:
+                    numbering_style.paragraph_format.alignment = alignment_value
                 # 兜底：直接写入底层XML的对齐设置
                 try:
                     pPr = heading._element.get_or_add_pPr()
                     # 移除已有 jc
                     for child in list(pPr):
-                        if child.tag == qn('w:jc'):
+                        if child.tag == _QN_JC:
                             pPr.remove(child)
                     jc = OxmlElement('w:jc')
-                    jc.set(qn('w:val'), para_config['alignment'].lower())
+                    jc.set(_QN_VAL, para_config['alignment'].lower())
                     pPr.append(jc)
                 except Exception:
                     pass
@@ -232,14 +370,17 @@ class MarkdownToDocxConverter:
             font_config = default_config.get('font', {})
             para_config = default_config.get('paragraph', {})
             
-            # 设置段落字体
+            # 设置段落字体（写在段落样式上，每个文档每个样式只写一次）
             if font_config:
-                paragraph.style.font.name = font_config.get('western', 'Times New Roman')
-                paragraph.style._element.rPr.rFonts.set(qn('w:eastAsia'), font_config.get('east_asian', '宋体'))
-                if 'size' in font_config:
-                    paragraph.style.font.size = font_config['size']
-                if 'color' in font_config:
-                    paragraph.style.font.color.rgb = font_config['color']
+                style = paragraph.style
+                if style.style_id not in self._baked_para_styles:
+                    style.font.name = font_config.get('western', 'Times New Roman')
+                    style._element.rPr.rFonts.set(_QN_EAST_ASIA, font_config.get('east_asian', '宋体'))
+                    if 'size' in font_config:
+                        style.font.size = font_config['size']
+                    if 'color' in font_config:
+                        style.font.color.rgb = font_config['color']
+                    self._baked_para_styles.add(style.style_id)
             
             # 设置段落格式
             if para_config:
@@ -254,21 +395,15 @@ class MarkdownToDocxConverter:
             self._process_element(child, paragraph)
 
     # ===== 数学公式（LaTeX -> MathML -> OMML）支持 =====
-    def _get_xslt_transformer(self, xsl_path="/home/yzy/document/project/AI_office-main/config/mml2omml.xsl"):
-        if self._xslt_transform is None:
-            try:
-                with open(xsl_path, 'rb') as f:
-                    xslt_root = etree.XML(f.read())
-                self._xslt_transform = etree.XSLT(xslt_root)
-            except Exception:
-                self._xslt_transform = None
-        return self._xslt_transform
+    def _get_xslt_transformer(self, xsl_path=_MML2OMML_XSL):
+        return _load_xslt(xsl_path)
 
     def _mathml_to_omml(self, mathml_str: str) -> Optional[str]:
         try:
             transformer = self._get_xslt_transformer()
             if transformer is None:
                 return None
+            from lxml import etree
             mathml_doc = etree.fromstring(mathml_str.encode('utf-8'))
             omml_doc = transformer(mathml_doc)
             return str(omml_doc)
@@ -276,11 +411,7 @@ class MarkdownToDocxConverter:
             return None
 
     def _latex_to_omml(self, latex_expr: str) -> Optional[str]:
-        try:
-            mathml = latex_to_mathml(latex_expr)
-        except Exception:
-            return None
-        return self._mathml_to_omml(mathml)
+        return _latex_to_omml(latex_expr)
 
     def _append_omml_to_paragraph(self, paragraph, omml_xml: str, center: bool = False):
         try:
@@ -292,12 +423,14 @@ class MarkdownToDocxConverter:
             pass
 
     def _append_text_with_math(self, paragraph, text: str):
-        import re
         if not text:
             return
-        pattern = re.compile(r"(\$\$(.+?)\$\$)|(\$(.+?)\$)", re.DOTALL)
+        # 不含公式的普通文本无需正则扫描
+        if '$' not in text:
+            paragraph.add_run(text)
+            return
         last_idx = 0
-        for m in pattern.finditer(text):
+        for m in _MATH_RE.finditer(text):
             # 先添加匹配前的普通文本
             if m.start() > last_idx:
                 paragraph.add_run(text[last_idx:m.start()])
@@ -387,6 +520,8 @@ class MarkdownToDocxConverter:
                 font_config = list_config['font']
                 if 'size' in font_config:
                     paragraph.style.font.size = font_config['size']
+                    # 样式被改写，段落内容需要重新写入默认段落字体
+                    self._baked_para_styles.discard(paragraph.style.style_id)
             
             for child in li.children:
                 self._process_element(child, paragraph)
@@ -398,7 +533,16 @@ class MarkdownToDocxConverter:
             return os.path.join(self._input_base_dir, src)
         return src
 
-    
+    def _image_stream(self, image_path: str) -> io.BytesIO:
+        """读取图片为内存流，同一文件只读一次；python-docx 按 SHA1 复用图片部件，重复图片只嵌入一份"""
+        path = os.path.abspath(image_path)
+        key = (path, os.stat(path).st_mtime)
+        data = self._image_cache.get(key)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            self._image_cache[key] = data
+        return io.BytesIO(data)
 
     def _process_image(self, img_tag: Tag, caption_text: str = None):
         """处理图片 <img>（支持对齐、尺寸、间距、标题）"""
@@ -445,15 +589,16 @@ class MarkdownToDocxConverter:
 
         # 插入图片（使用文档级 add_picture 生成独立段落，便于设置对齐与间距）
         try:
+            image = self._image_stream(image_path)
             if width_in is not None and (height_in is None or height_in == 'auto'):
-                self.doc.add_picture(image_path, width=Inches(width_in))
+                self.doc.add_picture(image, width=Inches(width_in))
             elif height_in is not None and (width_in is None or width_in == 'auto'):
-                self.doc.add_picture(image_path, height=Inches(height_in))
+                self.doc.add_picture(image, height=Inches(height_in))
             elif width_in is not None and height_in is not None and isinstance(width_in, (int, float)) and isinstance(height_in, (int, float)):
                 # 优先使用宽度，保持比例
-                self.doc.add_picture(image_path, width=Inches(width_in))
+                self.doc.add_picture(image, width=Inches(width_in))
             else:
-                self.doc.add_picture(image_path)
+                self.doc.add_picture(image)
         except Exception:
             # 插入失败则跳过
             return
@@ -461,12 +606,7 @@ class MarkdownToDocxConverter:
         # 设置图片所在段落的对齐与间距
         if self.doc.paragraphs:
             pic_para = self.doc.paragraphs[-1]
-            if align == 'left':
-                pic_para.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            elif align == 'right':
-                pic_para.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-            else:
-                pic_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+            pic_para.alignment = _PARA_ALIGN.get(align, WD_PARAGRAPH_ALIGNMENT.CENTER)
             try:
                 if space_before is not None:
                     pic_para.paragraph_format.space_before = space_before
@@ -499,8 +639,7 @@ class MarkdownToDocxConverter:
             # 段落样式
             para_cfg = (cap_cfg.get('paragraph') or {})
             try:
-                align_str = (para_cfg.get('alignment') or align).upper()
-                cap_para.alignment = getattr(WD_PARAGRAPH_ALIGNMENT, align_str)
+                cap_para.alignment = _para_alignment(para_cfg.get('alignment') or align)
             except Exception:
                 pass
             try:
@@ -519,11 +658,10 @@ class MarkdownToDocxConverter:
 
         # 收集行
         rows = []
-        for tr in element.find_all('tr', recursive=True):
-            cells = []
-            for cell in tr.find_all(['th', 'td'], recursive=False):
-                # 收集纯文本（保留子节点文本）
-                cells.append(cell.get_text(strip=True))
+        for tr in element.find_all('tr'):
+            # 直接子节点中的 th/td，收集纯文本（保留子节点文本）
+            cells = [cell.get_text(strip=True) for cell in tr.children
+                     if getattr(cell, 'name', None) in _CELL_TAGS]
             if cells:
                 rows.append(cells)
         if not rows:
@@ -537,19 +675,14 @@ class MarkdownToDocxConverter:
             pass
 
         # 对齐
-        if align == 'left':
-            table.alignment = WD_TABLE_ALIGNMENT.LEFT
-        elif align == 'right':
-            table.alignment = WD_TABLE_ALIGNMENT.RIGHT
-        else:
-            table.alignment = WD_TABLE_ALIGNMENT.CENTER
+        table.alignment = _TABLE_ALIGN.get(align, WD_TABLE_ALIGNMENT.CENTER)
 
-        # 填充内容
-        for r_idx, row in enumerate(rows):
+        # 填充内容：每行只取一次单元格，宽度设置时复用
+        grid = [tr.cells for tr in table.rows]
+        for row, tcells in zip(rows, grid):
+            n = len(row)
             for c_idx in range(cols):
-                text = row[c_idx] if c_idx < len(row) else ''
-                cell = table.cell(r_idx, c_idx)
-                cell.text = text
+                tcells[c_idx].text = row[c_idx] if c_idx < n else ''
 
         # 列宽
         col_cfg = (tables_cfg.get('column_widths') or {})
@@ -559,60 +692,40 @@ class MarkdownToDocxConverter:
             width_length = Inches(default_w) if unit == 'inches' else None
             if width_length is not None:
                 try:
-                    for c_idx in range(cols):
-                        for r_idx in range(len(rows)):
-                            table.cell(r_idx, c_idx).width = width_length
+                    # Word 按单元格宽度排版，逐格设置
+                    for tcells in grid:
+                        for cell in tcells:
+                            cell.width = width_length
                 except Exception:
                     pass
 
+    def _process_figure(self, element, parent_paragraph=None):
+        """figure 中包含 img 与可选 figcaption，figcaption 作为图片标题"""
+        img = element.find('img')
+        if img is not None:
+            cap_tag = element.find('figcaption')
+            caption = cap_tag.get_text(strip=True) if cap_tag is not None else None
+            self._process_image(img, caption_text=caption)
+
+    def _process_br(self, element, parent_paragraph=None):
+        if parent_paragraph:
+            parent_paragraph.add_run('\n')
+
     def _process_element(self, element, parent_paragraph=None):
-        """递归处理HTML元素"""
-        if isinstance(element, Tag):
-            # 跳过已处理的节点（如图片标题）
-            if element.has_attr('data-processed'):
-                return
-            # 设计约定：# 作为文章标题，不参与编号；从 ## 开始并保持原生级别映射
-            # 即：## -> h2，### -> h3
-            if element.name.startswith('h') and len(element.name) == 2 and int(element.name[1]) > 1:
-                level = int(element.name[1])
-                self._process_heading(element, level)
-            elif element.name == 'p':
-                self._process_paragraph(element, parent_paragraph)
-            elif element.name == 'img':
-                # 单独处理图片为独立段落
-                self._process_image(element)
-                element['data-processed'] = 'true'
-                return
-            elif element.name == 'figure':
-                # figure 中包含 img 与可选 figcaption
-                img = element.find('img')
-                if img is not None:
-                    caption = None
-                    cap_tag = element.find('figcaption')
-                    if cap_tag is not None:
-                        caption = cap_tag.get_text(strip=True)
-                        cap_tag['data-processed'] = 'true'
-                    self._process_image(img, caption_text=caption)
-                    element['data-processed'] = 'true'
-                    return
-            elif element.name in ['strong', 'b']:
-                self._process_formatting(element, parent_paragraph, 'bold')
-            elif element.name in ['em', 'i']:
-                self._process_formatting(element, parent_paragraph, 'italic')
-            elif element.name == 'br' and parent_paragraph:
-                parent_paragraph.add_run('\n')
-            elif element.name in ['ul', 'ol']:
-                self._process_list(element, element.name)
-            elif element.name in ['code', 'pre']:
-                self._process_formatting(element, parent_paragraph, 'code')
-            elif element.name == 'table':
-                self._process_table(element)
-            else:
-                for child in element.children:
-                    self._process_element(child, parent_paragraph)
-        elif parent_paragraph is not None:
-            # 处理文本节点（支持 $...$ 与 $$...$$ 数学公式）
-            self._append_text_with_math(parent_paragraph, str(element))
+        """处理HTML元素（每个节点只访问一次，按标签名分派；无处理函数的标签用显式栈展开，不递归）"""
+        stack = [element]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Tag):
+                handler = _DISPATCH.get(node.name)
+                if handler is not None:
+                    handler(self, node, parent_paragraph)
+                else:
+                    # 逆序入栈，保证按文档顺序出栈
+                    stack.extend(reversed(node.contents))
+            elif parent_paragraph is not None:
+                # 处理文本节点（支持 $...$ 与 $$...$$ 数学公式）
+                self._append_text_with_math(parent_paragraph, str(node))
     
     def convert(self, input_file, output_file):
         """执行转换过程"""
@@ -621,11 +734,13 @@ class MarkdownToDocxConverter:
             md_content = f.read()
         
         # 转换Markdown为HTML
-        md = Markdown(extensions=['toc', 'tables'])
-        html_content = md.convert(md_content)
+        html_content = _md_to_html(md_content)
         
         # 创建文档
         self.doc = self._create_document()
+        self._baked_heading_levels = set()
+        self._baked_para_styles = set()
+        self._numbering_style = False  # 尚未查找
         # 记录输入文件所在目录，供相对路径资源（图片等）解析
         self._input_base_dir = os.path.dirname(os.path.abspath(input_file))
         
@@ -633,16 +748,36 @@ class MarkdownToDocxConverter:
         self._apply_page_layout()
         
         # 解析HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
+        root = _parse_html(html_content)
         
-        # 处理所有子元素
-        for child in soup.children:
-            self._process_element(child)
+        # 处理所有子元素（根节点本身没有处理函数，直接展开）
+        self._process_element(root)
         
         # 保存文档
         self.doc.save(output_file)
         print(f"Successfully converted {input_file} to {output_file}")
 
+# 标签名 -> 处理函数 (converter, element, parent_paragraph)，未列出的标签递归处理子节点
+# 设计约定：# 作为文章标题，不参与编号；从 ## 开始并保持原生级别映射，即 ## -> h2，### -> h3
+_HEADING_TAGS = {'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+_DISPATCH = {tag: (lambda self, el, pp, level=level: self._process_heading(el, level))
+             for tag, level in _HEADING_TAGS.items()}
+for _tag, _style in (('strong', 'bold'), ('b', 'bold'), ('em', 'italic'), ('i', 'italic'),
+                     ('code', 'code'), ('pre', 'code')):
+    _DISPATCH[_tag] = lambda self, el, pp, style=_style: self._process_formatting(el, pp, style)
+_DISPATCH.update({
+    'p': lambda self, el, pp: self._process_paragraph(el, pp),
+    # 单独处理图片为独立段落
+    'img': lambda self, el, pp: self._process_image(el),
+    'figure': lambda self, el, pp: self._process_figure(el),
+    'br': lambda self, el, pp: self._process_br(el, pp),
+    'ul': lambda self, el, pp: self._process_list(el, 'ul'),
+    'ol': lambda self, el, pp: self._process_list(el, 'ol'),
+    'table': lambda self, el, pp: self._process_table(el),
+})
+del _tag, _style
+
+
 # 使用示例
 if __name__ == "__main__":
     converter = MarkdownToDocxConverter()
@@ -26,23 +26,22 @@ def test_component_imports():
     print("pptx_engine 组件导入测试")
     print("=" * 60)
     
-    components = [
-        ("FontCalculator", "core.pptx_engine.font_calculator"),
-        ("ContentRenderer", "core.pptx_engine.content_renderer"), 
-        ("LayoutManager", "core.pptx_engine.layout_manager"),
-        ("SlideBuilder", "core.pptx_engine.slide_builder"),
-        ("PPTXBuilder", "core.pptx_engine.pptx_builder")
-    ]
+    components = ("FontCalculator", "ContentRenderer", "LayoutManager", "SlideBuilder", "PPTXBuilder")
+    
+    # 组件均由 core.pptx_engine 包导出，导入一次包后逐个取属性
+    try:
+        import core.pptx_engine as pe
+    except Exception as e:
+        for component_name in components:
+            print(f"❌ {component_name} 导入失败: {e}")
+        return False
     
     all_success = True
-    for component_name, module_name in components:
+    for component_name in components:
         try:
-            # 使用importlib来正确导入模块
-            import importlib
-            module = importlib.import_module(module_name)
-            component_class = getattr(module, component_name)
+            getattr(pe, component_name)
             print(f"✅ {component_name} 导入成功")
-        except Exception as e:
+        except AttributeError as e:
             print(f"❌ {component_name} 导入失败: {e}")
             all_success = False
     
@@ -192,6 +191,124 @@ def test_individual_components():
         return False
 
 
+def test_text_wrapping():
+    """测试文本折行：常见长度的中文句子不应被强制换行"""
+    print("\n" + "=" * 60)
+    print("文本折行测试")
+    print("=" * 60)
+    
+    from core.pptx_engine.content_renderer import _wrap_text
+    
+    cases = [
+        ("中文单行", "AI 办公自动化平台（支持 12 类文档）正在构建企业的数字护城河", 1),
+        ("中文满行", "测" * 42, 1),
+        ("中文超长", "测" * 43, 2),
+        ("英文单行", "word " * 16, 1),
+    ]
+    all_success = True
+    for name, text, expected_lines in cases:
+        lines = _wrap_text(text).count("\n") + 1
+        if lines == expected_lines:
+            print(f"✅ {name}: {lines} 行")
+        else:
+            print(f"❌ {name}: 期望 {expected_lines} 行，实际 {lines} 行")
+            all_success = False
+    
+    # 中英混排：前面的空格不应导致中文行提前断开，首行应排满
+    mixed = "企业数字化转型已从可选变为必选，AI 正在重塑" + "测" * 30
+    first_line = _wrap_text(mixed).split("\n")[0]
+    if first_line == mixed[:43]:
+        print(f"✅ 中英混排: 首行 {len(first_line)} 字")
+    else:
+        print(f"❌ 中英混排: 首行提前断开: {first_line}")
+        all_success = False
+    
+    return all_success
+
+
+def test_batch_conversion():
+    """测试批量转换：URL 按输入顺序返回；构建失败时抛出异常，且已提交的上传在返回前全部结束"""
+    print("\n" + "=" * 60)
+    print("批量转换测试")
+    print("=" * 60)
+    
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    import core.services.pptx_mcp_service as service_module
+    from core.pptx_engine.logger import get_logger
+    
+    class FakeStorage:
+        """记录已完成上传的对象名，代替 MinIO"""
+        def __init__(self):
+            self.uploaded = []
+            self.lock = threading.Lock()
+        
+        def upload_stream(self, stream, length, object_name):
+            time.sleep(0.05)
+            with self.lock:
+                self.uploaded.append(object_name)
+            return f"http://storage/{object_name}"
+    
+    def fake_build(md_content, template_path):
+        # 内容为数字时按其大小延时：先提交的后完成，检验结果顺序与完成顺序无关
+        if md_content == "fail":
+            raise ValueError("构建失败")
+        time.sleep(0.02 * int(md_content))
+        return md_content.encode()
+    
+    storage = FakeStorage()
+    service = service_module.PPTXMCPService.__new__(service_module.PPTXMCPService)
+    service.logger = get_logger()
+    service.template_path = None
+    service.minio_service = storage
+    
+    original = (service_module._build_pptx_worker, service_module._get_build_pool)
+    build_pool = ThreadPoolExecutor(max_workers=4)
+    all_success = True
+    try:
+        service_module._build_pptx_worker = fake_build
+        for mode, pool in (("进程内构建", None), ("构建池", build_pool)):
+            service_module._get_build_pool = lambda pool=pool: pool
+            
+            urls = service.convert_many_md_to_pptx_urls(["4", "3", "2", "1", "0"], list("abcde"))
+            if urls == [f"http://storage/{name}.pptx" for name in "abcde"]:
+                print(f"✅ {mode}: 结果顺序与输入一致")
+            else:
+                print(f"❌ {mode}: 结果顺序错误: {urls}")
+                all_success = False
+            
+            storage.uploaded.clear()
+            try:
+                service.convert_many_md_to_pptx_urls(["0", "fail", "3"], list("xyz"))
+                print(f"❌ {mode}: 构建失败时未抛出异常")
+                all_success = False
+            except ValueError:
+                uploaded = len(storage.uploaded)
+                time.sleep(0.2)
+                if len(storage.uploaded) == uploaded:
+                    print(f"✅ {mode}: 构建失败时抛出异常，无遗留上传")
+                else:
+                    print(f"❌ {mode}: 抛出异常后仍有上传在进行")
+                    all_success = False
+            
+            storage.uploaded.clear()
+            try:
+                service.convert_many_md_to_pptx_urls(["0", "1"], ["x"])
+                print(f"❌ {mode}: 文件名数量不一致时未抛出异常")
+                all_success = False
+            except ValueError:
+                if storage.uploaded:
+                    print(f"❌ {mode}: 文件名数量不一致时仍有上传")
+                    all_success = False
+                else:
+                    print(f"✅ {mode}: 文件名数量不一致时直接抛出异常")
+    finally:
+        service_module._build_pptx_worker, service_module._get_build_pool = original
+        build_pool.shutdown()
+    
+    return all_success
+
+
 def show_test_files():
     """显示测试文件信息"""
     test_files = [
@@ -224,8 +341,14 @@ def main():
     # 测试子组件独立功能
     individual_success = test_individual_components()
     
+    # 测试文本折行
+    wrap_success = test_text_wrapping()
+    
+    # 测试批量转换
+    batch_success = test_batch_conversion()
+    
     # 测试组件功能
-    if import_success and init_success and individual_success:
+    if import_success and init_success and individual_success and wrap_success and batch_success:
         functionality_success = test_pptx_builder_functionality()
         
         print("\n" + "=" * 60)
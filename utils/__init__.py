@@ -4,9 +4,59 @@
 包含以下工具模块：
 - docx_utils: DOCX相关工具函数
 - pptx_utils: PPTX相关工具函数
+
+子模块依赖 python-docx / python-pptx，按需导入：首次访问某个名称时才加载其所在模块（PEP 562）
 """
 
-from .docx_utils import *
-from .pptx_utils import *
+import importlib
+
+# 名称 -> 所在子模块
+_LAZY = {
+    # docx_utils
+    'get_qn_name': 'docx_utils',
+    'get_numbering_part': 'docx_utils',
+    'get_known_formats': 'docx_utils',
+    'get_string_for_format': 'docx_utils',
+    'apply_numbering': 'docx_utils',
+    'get_ppr_val': 'docx_utils',
+    'add_numbered_paragraph': 'docx_utils',
+    'add_numbered_head': 'docx_utils',
+    'load_custom_numbering': 'docx_utils',
+    'create_document_with_custom_numbering': 'docx_utils',
+    'create_document_with_programmatic_numbering': 'docx_utils',
+    # pptx_utils
+    'pptx_available': 'pptx_utils',
+    'read_text': 'pptx_utils',
+    'parse_md_for_ppt_structure': 'pptx_utils',
+    'update_text_preserve_format': 'pptx_utils',
+    'get_shape_info': 'pptx_utils',
+    'extract_sections_from_md': 'pptx_utils',
+    'resolve_path': 'pptx_utils',
+    'resolve_template_path': 'pptx_utils',
+    'split_title_by_length': 'pptx_utils',
+    'smart_update_toc_items': 'pptx_utils',
+    'extract_subsection_content_from_md': 'pptx_utils',
+    'extract_chapter_content_from_md': 'pptx_utils',
+    'get_slide_master_layouts': 'pptx_utils',
+}
+
+_SUBMODULES = ('docx_utils', 'pptx_utils')
+
+__all__ = [*_SUBMODULES, *_LAZY]
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    try:
+        module_name = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module('.' + module_name, __name__), name)
+    # 缓存到模块全局，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
 
-__all__ = ['docx_utils', 'pptx_utils']
+def __dir__():
+    return sorted({*globals(), *__all__})
@@ -6,7 +6,7 @@ PPT 处理工具函数集合
 import os
 import re
 import json
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 try:
     from pptx import Presentation
@@ -609,13 +609,12 @@ def smart_update_toc_items(slide, toc_items: list):
         print(f"智能更新目录时出错: {e}")
 
 
-def extract_subsection_content_from_md(md_text: str) -> list:
-    """从Markdown文本中提取子章节内容，每个子标题(###)单独成页"""
+def extract_subsection_content_from_md(md_text: str) -> Iterator[dict]:
+    """从Markdown文本中提取子章节内容，每个子标题(###)单独成页（逐个产出，不构建完整列表）"""
     if not md_text:
-        return []
+        return
     
     lines = md_text.split('\n')
-    subsections = []
     current_chapter_number = 0
     current_chapter_title = ""
     current_subsection = None
@@ -639,7 +638,7 @@ def extract_subsection_content_from_md(md_text: str) -> list:
                 current_chapter_title = match.group(2).strip()
             # 每遇到新章节，重置当前子章节
             if current_subsection:
-                subsections.append(current_subsection)
+                yield current_subsection
                 current_subsection = None
             i += 1
             continue
@@ -648,7 +647,7 @@ def extract_subsection_content_from_md(md_text: str) -> list:
         elif line.startswith('### ') and current_chapter_number > 0:
             # 保存之前的子章节
             if current_subsection:
-                subsections.append(current_subsection)
+                yield current_subsection
             
             # 开始新的子章节
             current_subsection = {
@@ -771,9 +770,7 @@ def extract_subsection_content_from_md(md_text: str) -> list:
     
     # 保存最后一个子章节
     if current_subsection:
-        subsections.append(current_subsection)
-    
-    return subsections
+        yield current_subsection
 
 
 def extract_chapter_content_from_md(md_text: str) -> list: